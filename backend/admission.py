@@ -0,0 +1,170 @@
+import asyncio
+import heapq
+import itertools
+import json
+import re
+from collections import Counter
+
+# Lower numbers are admitted first
+PRIORITY_WRITE = 0
+PRIORITY_READ = 1
+PRIORITY_LISTING = 2
+
+PRIORITY_NAMES = {
+    PRIORITY_WRITE: "write",
+    PRIORITY_READ: "read",
+    PRIORITY_LISTING: "listing",
+}
+
+
+def route_priority(method: str, path: str, query_string: bytes) -> int:
+    if method not in ("GET", "HEAD"):
+        return PRIORITY_WRITE
+    # Full item listings (history, unfiltered /items) are the most expensive
+    # reads and the easiest for a client to retry later
+    if path == "/api/items" and b"type=" not in query_string:
+        return PRIORITY_LISTING
+    if path == "/api/bootstrap" and b"view=history" in query_string:
+        return PRIORITY_LISTING
+    return PRIORITY_READ
+
+
+class AdmissionController:
+    """Concurrency limit with a bounded, prioritized wait queue.
+
+    Up to ``limit`` requests run at once. Further requests wait in a queue of
+    at most ``max_queue`` entries, ordered by priority and then arrival. A
+    full queue rejects the newcomer unless it outranks the least important
+    waiter, which is then shed instead. Nobody waits longer than
+    ``queue_timeout`` seconds, which keeps tail latency bounded under
+    overload.
+    """
+
+    def __init__(self, limit: int, max_queue: int, queue_timeout: float):
+        self.limit = limit
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self._waiting = []  # heap of [priority, seq, future]
+        self._seq = itertools.count()
+        self.admitted = Counter()
+        self.shed = Counter()
+
+    async def acquire(self, priority: int) -> bool:
+        if self.in_flight < self.limit and not self._waiting:
+            self.in_flight += 1
+            self.admitted[priority] += 1
+            return True
+
+        if len(self._waiting) >= self.max_queue:
+            worst = max(self._waiting, default=None)
+            if worst is None or worst[0] <= priority:
+                self.shed["queue_full"] += 1
+                return False
+            self._remove(worst)
+            worst[2].set_result(False)
+            self.shed["displaced"] += 1
+
+        future = asyncio.get_running_loop().create_future()
+        entry = [priority, next(self._seq), future]
+        heapq.heappush(self._waiting, entry)
+        try:
+            granted = await asyncio.wait_for(asyncio.shield(future), self.queue_timeout)
+        except asyncio.TimeoutError:
+            if future.done():
+                granted = future.result()
+            else:
+                self._remove(entry)
+                future.cancel()
+                self.shed["timeout"] += 1
+                return False
+        except asyncio.CancelledError:
+            # The client went away while queued
+            if future.done() and future.result():
+                self.release()
+            elif not future.done():
+                self._remove(entry)
+                future.cancel()
+            raise
+        if granted:
+            self.admitted[priority] += 1
+        return granted
+
+    def release(self):
+        while self._waiting:
+            _, _, future = heapq.heappop(self._waiting)
+            if not future.done():
+                # Hand the slot straight to the next waiter
+                future.set_result(True)
+                return
+        self.in_flight -= 1
+
+    def _remove(self, entry):
+        self._waiting.remove(entry)
+        heapq.heapify(self._waiting)
+
+    def snapshot(self) -> dict:
+        queued = Counter(entry[0] for entry in self._waiting)
+        return {
+            "limit": self.limit,
+            "maxQueue": self.max_queue,
+            "queueTimeoutSeconds": self.queue_timeout,
+            "inFlight": self.in_flight,
+            "queueDepth": len(self._waiting),
+            "queueDepthByPriority": {name: queued[p] for p, name in PRIORITY_NAMES.items()},
+            "admitted": {name: self.admitted[p] for p, name in PRIORITY_NAMES.items()},
+            "shed": dict(self.shed),
+        }
+
+
+class AdmissionMiddleware:
+    """Run /api requests through an AdmissionController, answering 503 when shed.
+
+    ``routed`` pairs patterns with controllers of their own; a request whose
+    ``"METHOD /path"`` matches one is admitted there instead of by
+    ``controller``.
+    """
+
+    def __init__(self, app, controller: AdmissionController, exempt=(), retry_after: int = 1, routed=()):
+        self.app = app
+        self.controller = controller
+        self.exempt = set(exempt)
+        self.retry_after = str(retry_after).encode()
+        self.routed = [(re.compile(pattern), routed_to) for pattern, routed_to in routed]
+
+    def controller_for(self, method: str, path: str) -> AdmissionController:
+        request = f"{method} {path}"
+        for pattern, controller in self.routed:
+            if pattern.match(request):
+                return controller
+        return self.controller
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or not scope["path"].startswith("/api")
+            or scope["path"] in self.exempt
+            or scope["method"] == "OPTIONS"
+        ):
+            return await self.app(scope, receive, send)
+
+        controller = self.controller_for(scope["method"], scope["path"])
+        priority = route_priority(scope["method"], scope["path"], scope.get("query_string", b""))
+        if not await controller.acquire(priority):
+            payload = json.dumps({"detail": "Server is busy, please retry"}).encode()
+            await send({
+                "type": "http.response.start",
+                "status": 503,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(payload)).encode()),
+                    (b"retry-after", self.retry_after),
+                ],
+            })
+            await send({"type": "http.response.body", "body": payload})
+            return
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            controller.release()
@@ -0,0 +1,79 @@
+import io
+import re
+from typing import Optional, Tuple
+
+# Read/write granularity for streaming; matches the GridFS default chunk size
+CHUNK_SIZE = 255 * 1024
+THUMBNAIL_SIZE = (256, 256)
+
+RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def parse_range(header: Optional[str], length: int) -> Optional[Tuple[int, int]]:
+    """Inclusive (start, end) for a single-range ``Range`` header.
+
+    Returns None when the whole file should be sent (no header, an invalid
+    range such as ``bytes=3-2``, or a form we don't serve, such as multiple
+    ranges) and raises RangeNotSatisfiable when the range lies outside the
+    file.
+    """
+    if not header:
+        return None
+    match = RANGE_PATTERN.match(header.strip())
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Suffix range: the last N bytes
+        suffix = int(last)
+        if suffix == 0 or length == 0:
+            raise RangeNotSatisfiable()
+        return max(0, length - suffix), length - 1
+    start = int(first)
+    if last and int(last) < start:
+        # Not a valid range at all, so the header is ignored (RFC 9110 14.2)
+        return None
+    if start >= length:
+        raise RangeNotSatisfiable()
+    end = min(int(last), length - 1) if last else length - 1
+    return start, end
+
+
+def make_thumbnail(source) -> Optional[bytes]:
+    """JPEG thumbnail of an image file object, or None if it isn't an image.
+
+    CPU-bound; run it in a thread pool, not on the event loop.
+    """
+    try:
+        from PIL import Image  # only uploads need it; keep it off the startup path
+    except ImportError:  # thumbnails are skipped without Pillow
+        return None
+    source.seek(0)
+    try:
+        with Image.open(source) as image:
+            image.thumbnail(THUMBNAIL_SIZE)
+            if image.mode not in ("RGB", "L"):
+                image = image.convert("RGB")
+            out = io.BytesIO()
+            image.save(out, format="JPEG", quality=80)
+            return out.getvalue()
+    except (OSError, ValueError, Image.DecompressionBombError):
+        return None
+
+
+async def stream_file(grid_out, start: int, end: int):
+    """Yield bytes start..end (inclusive) of a GridFS file in chunks"""
+    grid_out.seek(start)
+    remaining = end - start + 1
+    while remaining > 0:
+        chunk = await grid_out.read(min(CHUNK_SIZE, remaining))
+        if not chunk:
+            break
+        remaining -= len(chunk)
+        yield chunk
@@ -0,0 +1,58 @@
+"""
+Monthly spending per budget scope, kept as running totals.
+
+``budget_totals`` holds one document per month and scope (the household, or
+a paying user), ``{"_id": "2026-10:household", "spent": <øre>}``, in the
+base currency. Item writes turn the item before and after into per-key
+deltas and ``$inc`` them, so a budget's status is a lookup by ``_id``
+however many expenses there are.
+"""
+
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+from codec import decode_item, to_minor
+from fx import get_rates
+
+HOUSEHOLD = "household"
+
+
+def month_key(when: datetime) -> str:
+    return when.strftime("%Y-%m")
+
+
+def total_key(month: str, scope: Optional[str]) -> str:
+    """``_id`` of the running total for a month and a user (None: household)"""
+    return f"{month}:{scope or HOUSEHOLD}"
+
+
+def contributions(doc: Optional[dict]) -> Dict[str, int]:
+    """What a stored item adds to the running totals"""
+    if doc is None:
+        return {}
+    item = decode_item(doc)
+    if item.get("type") != "expense":
+        return {}
+    month = month_key(item["createdAt"])
+    amount = get_rates().to_base(to_minor(item["amount"]), item["currency"], item["createdAt"])
+    totals = {total_key(month, None): amount}
+    if item.get("paidBy"):
+        totals[total_key(month, item["paidBy"])] = amount
+    return totals
+
+
+def spending_deltas(changes: Iterable[tuple]) -> Dict[str, int]:
+    """Net change per running total for (before, after) document pairs"""
+    deltas: Dict[str, int] = {}
+    for before, after in changes:
+        for key, amount in contributions(after).items():
+            deltas[key] = deltas.get(key, 0) + amount
+        for key, amount in contributions(before).items():
+            deltas[key] = deltas.get(key, 0) - amount
+    return {key: delta for key, delta in deltas.items() if delta}
+
+
+def crossed(limit: float, thresholds: Iterable[float], old: int, new: int) -> List[float]:
+    """Thresholds (fractions of ``limit``) that spending went up through"""
+    limit = to_minor(limit)
+    return [t for t in sorted(thresholds) if old < limit * t <= new]
@@ -0,0 +1,152 @@
+"""
+Stored representation of items.
+
+The API speaks floats in major units and uuid strings; the database stores
+amounts as int64 minor units (øre), ids as BSON binary UUIDs and leaves the
+currency out when it is the base currency. Documents written before the
+compact schema are still decoded, so the migration can run online.
+"""
+
+import uuid
+from decimal import ROUND_HALF_UP, Decimal
+from typing import List, Tuple
+
+from bson.binary import Binary, UuidRepresentation
+from bson.int64 import Int64
+
+BASE_CURRENCY = "DKK"
+MINOR_UNITS = 100
+
+ID_FIELDS = ("id", "createdBy", "paidBy", "recurringId")
+
+
+def to_minor(amount: float) -> int:
+    # Go through Decimal so 0.1 + 0.2 style floats round to the intended øre
+    return int((Decimal(str(amount)) * MINOR_UNITS).quantize(Decimal(1), ROUND_HALF_UP))
+
+
+def from_minor(amount: int) -> float:
+    return amount / MINOR_UNITS
+
+
+def encode_id(value):
+    """Canonical uuid strings become 16-byte binary; anything else is stored as-is"""
+    if not isinstance(value, str):
+        return value
+    try:
+        parsed = uuid.UUID(value)
+    except ValueError:
+        return value
+    if str(parsed) != value:
+        # Only forms that decode back to the exact same string are compacted
+        return value
+    return Binary.from_uuid(parsed, UuidRepresentation.STANDARD)
+
+
+def decode_id(value):
+    if isinstance(value, Binary):
+        return str(value.as_uuid(UuidRepresentation.STANDARD))
+    return value
+
+
+def id_query(value):
+    """Match an id in either representation while the migration is running"""
+    encoded = encode_id(value)
+    if encoded is value:
+        return value
+    return {"$in": [encoded, value]}
+
+
+def version_filter(version: int):
+    # Items written before versioning have no version field and count as 0
+    return {"$in": [0, None]} if version == 0 else version
+
+
+def ids_query(values) -> dict:
+    """``$in`` over several ids, in either representation"""
+    candidates = []
+    for value in values:
+        candidates.append(value)
+        encoded = encode_id(value)
+        if encoded is not value:
+            candidates.append(encoded)
+    return {"$in": candidates}
+
+
+def sum_by_id(rows, field: str) -> dict:
+    """Add up ``$group`` rows keyed by an id, per decoded id.
+
+    While the migration runs, one id can be stored in both representations
+    and so come back as two rows; their sums belong together.
+    """
+    totals = {}
+    for row in rows:
+        key = decode_id(row["_id"])
+        totals[key] = totals.get(key, 0) + row[field]
+    return totals
+
+
+def encode_fields(fields: dict) -> dict:
+    """Encode API-level field values (a whole item or a partial update)"""
+    doc = dict(fields)
+    for key in ID_FIELDS:
+        if key in doc:
+            doc[key] = encode_id(doc[key])
+    if doc.get("amount") is not None:
+        doc["amount"] = Int64(to_minor(doc["amount"]))
+    if doc.get("currency") == BASE_CURRENCY:
+        del doc["currency"]
+    return doc
+
+
+def encode_update(fields: dict) -> Tuple[dict, List[str]]:
+    """Encode a partial update as the fields to ``$set`` and those to ``$unset``.
+
+    Setting the currency back to the base currency removes the stored field,
+    leaving the document as a new item in that currency would be.
+    """
+    unset = ["currency"] if fields.get("currency") == BASE_CURRENCY else []
+    return encode_fields(fields), unset
+
+
+def decode_item(doc: dict) -> dict:
+    item = dict(doc)
+    for key in ID_FIELDS:
+        if key in item:
+            item[key] = decode_id(item[key])
+    # Only compact documents hold Int64; legacy amounts are doubles
+    if isinstance(item.get("amount"), Int64):
+        item["amount"] = from_minor(item["amount"])
+    item.setdefault("currency", BASE_CURRENCY)
+    return item
+
+
+# Aggregation expression for an item's amount in major units, whichever
+# representation the document is stored in
+AMOUNT_EXPR = {
+    "$cond": [
+        {"$eq": [{"$type": "$amount"}, "long"]},
+        {"$divide": ["$amount", MINOR_UNITS]},
+        "$amount",
+    ]
+}
+
+# Same, in integer minor units; legacy doubles are rounded to the nearest øre
+AMOUNT_MINOR_EXPR = {
+    "$cond": [
+        {"$eq": [{"$type": "$amount"}, "long"]},
+        "$amount",
+        {"$toLong": {"$round": [{"$multiply": ["$amount", MINOR_UNITS]}, 0]}},
+    ]
+}
+
+# Query matching documents that still need converting to the compact schema.
+# Only uuid-shaped strings count: other ids have no binary form and stay put.
+UUID_PATTERN = "^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$"
+LEGACY_QUERY = {
+    "$or": [
+        *({key: {"$regex": UUID_PATTERN}} for key in ID_FIELDS),
+        {"amount": {"$not": {"$type": "long"}}},
+        {"currency": BASE_CURRENCY},
+    ]
+}
@@ -0,0 +1,125 @@
+"""
+Append-only log of item mutations, and replaying it on top of a snapshot.
+
+Every write to ``items`` appends one event to ``item_events``:
+
+    {"_id": ObjectId, "item": <id>, "op": "create" | "update" | "delete",
+     "version": <item version after the write>, "data": {...}}
+
+``data`` is in stored form (int64 øre, binary UUIDs): the whole document for
+a create, only the fields written for an update, nothing for a delete. An
+update that removed fields (the currency, when set back to the base
+currency) lists them under ``"unset"``.
+Per-field sync timestamps are left out to keep the log small. The ObjectId
+records when the event was written.
+
+Snapshots (``snapshots`` plus one ``snapshot_items`` document per item) are
+fuzzy: items are copied while writes continue, and replay starts from events
+a little older than the snapshot. Events are applied in version order and
+only when newer than the state they land on, so events already reflected in
+the snapshot are skipped rather than applied twice. An item re-created after
+a delete (sync can reuse its id) starts from the version after the
+deletion's, so its events still sort after the delete.
+"""
+
+from typing import Dict, Iterable, List, Optional
+
+from codec import decode_id
+
+# Replay from this long before a snapshot started, which covers writes in
+# flight while it was taken and clock skew between workers
+SNAPSHOT_OVERLAP_SECONDS = 60
+
+EXCLUDED_FIELDS = ("_id", "fieldTimestamps")
+
+
+def _item_data(doc: dict, fields: Optional[Iterable[str]] = None) -> dict:
+    if fields is None:
+        fields = doc.keys()
+    return {k: doc.get(k) for k in fields if k not in EXCLUDED_FIELDS}
+
+
+def creation_event(doc: dict) -> dict:
+    return {
+        "item": doc["id"],
+        "op": "create",
+        "version": doc.get("version") or 0,
+        "data": _item_data(doc),
+    }
+
+
+def update_event(after: dict, fields: Iterable[str]) -> dict:
+    """Event for an update, given the document as it is after the write"""
+    fields = [k for k in fields if k not in EXCLUDED_FIELDS]
+    event = {
+        "item": after["id"],
+        "op": "update",
+        "version": after.get("version") or 0,
+        "data": {k: after[k] for k in fields if k in after},
+    }
+    unset = [k for k in fields if k not in after]
+    if unset:
+        event["unset"] = unset
+    return event
+
+
+def deletion_event(before: dict) -> dict:
+    """Event for a delete, given the document that was removed"""
+    return {"item": before["id"], "op": "delete", "version": (before.get("version") or 0) + 1}
+
+
+def changed_fields(before: dict, after: dict) -> List[str]:
+    return [
+        k for k in after.keys() | before.keys()
+        if k not in EXCLUDED_FIELDS and k != "version" and before.get(k) != after.get(k)
+    ]
+
+
+def diff_events(before: Dict[str, dict], after: Iterable[dict], item_ids: Iterable[str]) -> List[dict]:
+    """Events taking each item from ``before`` to ``after`` (both keyed by item id)"""
+    after = {decode_id(doc["id"]): doc for doc in after}
+    events = []
+    for item_id in item_ids:
+        old, new = before.get(item_id), after.get(item_id)
+        if old is None and new is not None:
+            events.append(creation_event(new))
+        elif old is not None and new is None:
+            events.append(deletion_event(old))
+        elif old is not None:
+            fields = changed_fields(old, new)
+            if fields:
+                events.append(update_event(new, fields))
+    return events
+
+
+def apply_event(items: Dict[str, dict], event: dict) -> bool:
+    """Apply one event to ``items`` (id -> stored document); False if skipped"""
+    item_id = decode_id(event["item"])
+    state = items.get(item_id)
+    op = event["op"]
+    if op == "create":
+        if state is not None:
+            return False
+        items[item_id] = dict(event["data"])
+        return True
+    if state is None or event["version"] <= (state.get("version") or 0):
+        return False
+    if op == "update":
+        state.update(event["data"])
+        for key in event.get("unset", ()):
+            state.pop(key, None)
+        state["version"] = event["version"]
+    else:
+        del items[item_id]
+    return True
+
+
+def replay(items: Dict[str, dict], events: Iterable[dict]) -> int:
+    """Bring a snapshot up to date with the events after it; returns how many applied.
+
+    Versions only ever grow per item, so sorting by version keeps each
+    item's events in the order they were written even when several workers'
+    clocks disagree about the ObjectIds.
+    """
+    ordered = sorted(events, key=lambda e: (e["version"], e["op"] == "delete", e["_id"]))
+    return sum(apply_event(items, event) for event in ordered)
@@ -0,0 +1,149 @@
+"""
+Exchange rates into the base currency, from a local rates file.
+
+The file (``fx_rates.csv`` next to this module, or ``FX_RATES_FILE``) has one
+row per date and currency, ``date,currency,rate``, where rate is the number
+of base-currency units one unit of the currency buys. It is read once per
+process into a date-indexed table; a day without a row uses the latest
+earlier rate, and days before the first row use the first.
+
+Amounts are converted where they are summed: inside aggregation pipelines
+(``amount_expr``) or, for totals over items already loaded, a whole column
+at a time (``convert``). Nothing converts item by item in Python.
+"""
+
+import bisect
+import csv
+import os
+from datetime import date, datetime, time, timedelta
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from codec import AMOUNT_MINOR_EXPR, BASE_CURRENCY
+
+RATES_FILE = Path(os.environ.get("FX_RATES_FILE", Path(__file__).parent / "fx_rates.csv"))
+
+MS_PER_DAY = 24 * 60 * 60 * 1000
+
+
+class UnknownCurrency(ValueError):
+    pass
+
+
+def _day(when) -> date:
+    return when.date() if isinstance(when, datetime) else when
+
+
+class RateTable:
+    def __init__(self, rows: Iterable[tuple]):
+        series: Dict[str, list] = {}
+        for day, currency, rate in rows:
+            if currency != BASE_CURRENCY:
+                series.setdefault(currency, []).append((day, rate))
+        self.dates: Dict[str, List[date]] = {}
+        self.rates: Dict[str, List[float]] = {}
+        for currency, points in series.items():
+            points.sort()
+            self.dates[currency] = [day for day, _ in points]
+            self.rates[currency] = [rate for _, rate in points]
+        all_dates = [day for dates in self.dates.values() for day in dates]
+        self.start = min(all_dates, default=date.today())
+        self.end = max(all_dates, default=date.today())
+
+    @classmethod
+    def from_csv(cls, path: Path) -> "RateTable":
+        with open(path, newline="") as f:
+            rows = [
+                (date.fromisoformat(row["date"]), row["currency"].strip().upper(), float(row["rate"]))
+                for row in csv.DictReader(line for line in f if not line.startswith("#"))
+            ]
+        return cls(rows)
+
+    @property
+    def currencies(self) -> List[str]:
+        return sorted({BASE_CURRENCY, *self.rates})
+
+    def check(self, currency: str):
+        if currency != BASE_CURRENCY and currency not in self.rates:
+            raise UnknownCurrency(currency)
+
+    def rate(self, currency: str, when) -> float:
+        if currency == BASE_CURRENCY:
+            return 1.0
+        self.check(currency)
+        i = bisect.bisect_right(self.dates[currency], _day(when)) - 1
+        return self.rates[currency][max(i, 0)]
+
+    def to_base(self, amount: int, currency: Optional[str], when) -> int:
+        """One amount in minor units, converted to base minor units"""
+        if not currency or currency == BASE_CURRENCY:
+            return amount
+        return round(amount * self.rate(currency, when))
+
+    def daily(self, currency: str, start: date, days: int) -> List[float]:
+        """The rate on each of ``days`` consecutive days from ``start``"""
+        return [self.rate(currency, start + timedelta(days=i)) for i in range(days)]
+
+    def amount_expr(self, start: Optional[date] = None, end: Optional[date] = None) -> dict:
+        """Aggregation expression for an item's amount in base minor units.
+
+        Each currency's rates are inlined as a dense per-day array from
+        ``start`` to ``end`` (default: the span of the rates file), so the
+        lookup in the database is a subtraction and an array index. Items
+        outside the span use the rate at its nearest end.
+        """
+        if not self.rates:
+            return AMOUNT_MINOR_EXPR
+        if start is None and end is None:
+            return self._full_expr()
+        start, end = _day(start or self.start), _day(end or self.end)
+        days = (end - start).days + 1
+        origin = datetime.combine(start, time())
+        index = {"$min": [days - 1, {"$max": [0, {"$floor": {
+            "$divide": [{"$subtract": ["$createdAt", origin]}, MS_PER_DAY]
+        }}]}]}
+        currency = {"$ifNull": ["$currency", BASE_CURRENCY]}
+        rate = {"$switch": {
+            "branches": [
+                {
+                    "case": {"$eq": [currency, code]},
+                    "then": {"$arrayElemAt": [self.daily(code, start, days), index]},
+                }
+                for code in sorted(self.rates)
+            ],
+            "default": 1,
+        }}
+        return {"$toLong": {"$round": [{"$multiply": [AMOUNT_MINOR_EXPR, rate]}, 0]}}
+
+    @lru_cache(maxsize=1)
+    def _full_expr(self) -> dict:
+        return self.amount_expr(self.start, self.end)
+
+    def convert(self, amounts: Sequence[int], currencies: Sequence[Optional[str]], dates: Sequence):
+        """Base minor amounts for parallel columns, as a numpy int64 array.
+
+        Rates are looked up with one searchsorted per currency rather than
+        one bisect per item.
+        """
+        import numpy as np  # only analytics needs it; keep it off the startup path
+
+        amounts = np.asarray(amounts, dtype=np.float64)
+        currencies = np.asarray([c or BASE_CURRENCY for c in currencies])
+        days = np.asarray([_day(d) for d in dates], dtype="datetime64[D]")
+        rates = np.ones(len(amounts))
+        for currency in set(currencies.tolist()) - {BASE_CURRENCY}:
+            self.check(currency)
+            mask = currencies == currency
+            table = np.asarray(self.dates[currency], dtype="datetime64[D]")
+            i = np.searchsorted(table, days[mask], side="right") - 1
+            rates[mask] = np.asarray(self.rates[currency])[np.clip(i, 0, None)]
+        return np.rint(amounts * rates).astype(np.int64)
+
+
+@lru_cache(maxsize=1)
+def get_rates() -> RateTable:
+    """The process-wide table, loaded from the rates file on first use"""
+    if not RATES_FILE.exists():
+        return RateTable([])
+    return RateTable.from_csv(RATES_FILE)
@@ -0,0 +1,188 @@
+import hashlib
+import json
+import uuid
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+
+from pymongo.errors import DuplicateKeyError
+
+MUTATING_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+HEADER = b"idempotency-key"
+
+
+class IdempotencyMiddleware:
+    """Replay stored responses for retried writes carrying an Idempotency-Key.
+
+    The first request with a given key claims it with a pending record, runs
+    the endpoint and stores the response. Retries with the same key and body
+    get the stored response back without the write being executed again. The
+    collection is expected to carry a TTL index on ``createdAt`` so old keys
+    expire on their own.
+
+    A pending claim is a lease good for ``lease_seconds``. If the worker
+    holding it dies before storing a response, a retry arriving after the
+    lease ran out takes the claim over and runs the request itself, instead
+    of getting 409 until the key expires.
+
+    Keyed requests are buffered to fingerprint them, so bodies larger than
+    ``max_body_bytes`` are refused with 413 before they are read in full.
+    """
+
+    def __init__(
+        self,
+        app,
+        get_collection: Callable,
+        lease_seconds: float = 60,
+        max_body_bytes: Optional[int] = None,
+    ):
+        self.app = app
+        self.get_collection = get_collection
+        self.lease = timedelta(seconds=lease_seconds)
+        self.max_body_bytes = max_body_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in MUTATING_METHODS:
+            return await self.app(scope, receive, send)
+
+        key = dict(scope["headers"]).get(HEADER)
+        if not key:
+            return await self.app(scope, receive, send)
+        key = key.decode("latin-1")
+
+        limit = self.max_body_bytes
+        declared = dict(scope["headers"]).get(b"content-length", b"")
+        if limit is not None and declared.isdigit() and int(declared) > limit:
+            return await _send_json(send, 413, {"detail": "Request body too large"})
+
+        body = bytearray()
+        more_body = True
+        while more_body:
+            message = await receive()
+            body += message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if limit is not None and len(body) > limit:
+                return await _send_json(send, 413, {"detail": "Request body too large"})
+        body = bytes(body)
+
+        fingerprint = hashlib.sha256(
+            b"\n".join([
+                scope["method"].encode(),
+                scope["path"].encode(),
+                scope.get("query_string", b""),
+                body,
+            ])
+        ).hexdigest()
+
+        collection = self.get_collection()
+        owner = uuid.uuid4().hex
+        now = datetime.utcnow()
+        try:
+            await collection.insert_one({
+                "_id": key,
+                "fingerprint": fingerprint,
+                "status": "pending",
+                "owner": owner,
+                "lockedUntil": now + self.lease,
+                "createdAt": now,
+            })
+        except DuplicateKeyError:
+            claimed = await collection.find_one_and_update(
+                {
+                    "_id": key,
+                    "fingerprint": fingerprint,
+                    "status": "pending",
+                    "lockedUntil": {"$not": {"$gt": now}},
+                },
+                {"$set": {"owner": owner, "lockedUntil": now + self.lease}},
+            )
+            if claimed is None:
+                record = await collection.find_one({"_id": key})
+                return await self._replay(record, fingerprint, send)
+        # Only the current lease holder may resolve the claim
+        claim = {"_id": key, "status": "pending", "owner": owner}
+
+        body_sent = False
+
+        async def replay_receive():
+            nonlocal body_sent
+            if not body_sent:
+                body_sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        response = {"status": 500, "headers": [], "body": b""}
+
+        async def capture_send(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                response["headers"] = [
+                    [k.decode("latin-1"), v.decode("latin-1")]
+                    for k, v in message.get("headers", [])
+                ]
+            elif message["type"] == "http.response.body":
+                response["body"] += message.get("body", b"")
+            await send(message)
+
+        try:
+            await self.app(scope, replay_receive, capture_send)
+        except BaseException:
+            await collection.delete_one(claim)
+            raise
+
+        if response["status"] >= 500:
+            # Let the client retry failed writes instead of pinning the error
+            await collection.delete_one(claim)
+            return
+
+        await collection.update_one(
+            claim,
+            {"$set": {
+                "status": "complete",
+                "responseStatus": response["status"],
+                "responseHeaders": response["headers"],
+                "responseBody": response["body"],
+            }},
+        )
+
+    async def _replay(self, record, fingerprint, send):
+        if record is None:
+            # The key expired or its request failed between our insert and read
+            return await _send_json(send, 409, {
+                "detail": "Idempotency-Key is being reused, please retry",
+            }, [(b"retry-after", b"1")])
+
+        if record["fingerprint"] != fingerprint:
+            return await _send_json(send, 422, {
+                "detail": "Idempotency-Key was already used for a different request",
+            })
+
+        if record["status"] != "complete":
+            return await _send_json(send, 409, {
+                "detail": "A request with this Idempotency-Key is still being processed",
+            }, [(b"retry-after", b"1")])
+
+        headers = [
+            (k.encode("latin-1"), v.encode("latin-1"))
+            for k, v in record["responseHeaders"]
+        ]
+        headers.append((b"idempotent-replayed", b"true"))
+        await send({
+            "type": "http.response.start",
+            "status": record["responseStatus"],
+            "headers": headers,
+        })
+        await send({"type": "http.response.body", "body": bytes(record["responseBody"])})
+
+
+async def _send_json(send, status, content, extra_headers=()):
+    payload = json.dumps(content).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(payload)).encode()),
+            *extra_headers,
+        ],
+    })
+    await send({"type": "http.response.body", "body": payload})
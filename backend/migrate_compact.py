@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Online, resumable migration of the items collection to the compact schema
+(int64 øre amounts, binary UUIDs, base currency left implicit).
+
+The API reads both representations, so this can run against a live
+database. Documents are converted in ``_id`` order in batches; progress is
+checkpointed in the ``migrations`` collection and an interrupted run picks up
+where it stopped. Each update only matches if the fields it rewrites are
+unchanged since they were read, so concurrent edits are never overwritten;
+documents that changed under us are re-read and retried.
+
+Usage:
+    python migrate_compact.py [--batch-size 500] [--dry-run] [--restart]
+"""
+
+import argparse
+import os
+import time
+from datetime import datetime
+from pathlib import Path
+
+from dotenv import load_dotenv
+from pymongo import MongoClient, UpdateOne
+
+from codec import ID_FIELDS, LEGACY_QUERY, decode_item, encode_fields
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+MIGRATION_ID = "compact_items"
+# Everything LEGACY_QUERY can flag, or a flagged document is never rewritten
+REWRITTEN_FIELDS = (*ID_FIELDS, "amount", "currency")
+MAX_RETRIES = 5
+
+
+def compact_update(doc):
+    """The conditional update converting one document, or None if it is compact"""
+    compact = encode_fields(decode_item(doc))
+    changes = {
+        k: compact[k] for k in REWRITTEN_FIELDS
+        if k in compact
+        and (type(compact[k]) is not type(doc.get(k)) or compact[k] != doc.get(k))
+    }
+    unset = {k: "" for k in REWRITTEN_FIELDS if k in doc and k not in compact}
+    if not changes and not unset:
+        return None
+
+    # Only apply if nothing we are about to rewrite changed since we read it
+    query = {"_id": doc["_id"]}
+    for k in REWRITTEN_FIELDS:
+        query[k] = doc[k] if k in doc else {"$exists": False}
+
+    update = {}
+    if changes:
+        update["$set"] = changes
+    if unset:
+        update["$unset"] = unset
+    return UpdateOne(query, update)
+
+
+def convert(items, docs):
+    """Convert ``docs``, retrying the ones that were modified concurrently"""
+    converted = 0
+    for _ in range(MAX_RETRIES):
+        operations = [op for op in map(compact_update, docs) if op is not None]
+        if not operations:
+            return converted, 0
+        converted += items.bulk_write(operations, ordered=False).modified_count
+        # Whatever still looks legacy lost a race with a live write; re-read it
+        docs = list(items.find({
+            "$and": [LEGACY_QUERY, {"_id": {"$in": [doc["_id"] for doc in docs]}}]
+        }))
+    return converted, len(docs)
+
+
+def migrate(db, batch_size, dry_run=False, restart=False):
+    checkpoint = db.migrations.find_one({"_id": MIGRATION_ID}) or {}
+    last_id = None if restart else checkpoint.get("lastId")
+    stats = {
+        "converted": 0 if restart else checkpoint.get("converted", 0),
+        "failed": 0 if restart else checkpoint.get("failed", 0),
+    }
+
+    if dry_run:
+        query = LEGACY_QUERY if last_id is None else {"$and": [LEGACY_QUERY, {"_id": {"$gt": last_id}}]}
+        print(f"{db.items.count_documents(query)} items to convert")
+        return stats
+
+    started = time.perf_counter()
+    while True:
+        query = LEGACY_QUERY if last_id is None else {"$and": [LEGACY_QUERY, {"_id": {"$gt": last_id}}]}
+        docs = list(db.items.find(query).sort("_id", 1).limit(batch_size))
+        if not docs:
+            break
+
+        converted, failed = convert(db.items, docs)
+        stats["converted"] += converted
+        stats["failed"] += failed
+        last_id = docs[-1]["_id"]
+        db.migrations.update_one(
+            {"_id": MIGRATION_ID},
+            {"$set": {"lastId": last_id, **stats, "updatedAt": datetime.utcnow()}},
+            upsert=True,
+        )
+        print(f"converted {stats['converted']} items ({time.perf_counter() - started:.1f}s)")
+
+    db.migrations.update_one(
+        {"_id": MIGRATION_ID},
+        {"$set": {"completedAt": datetime.utcnow()}},
+        upsert=True,
+    )
+    if stats["failed"]:
+        print(f"{stats['failed']} items kept changing under the migration; rerun with --restart")
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--dry-run", action="store_true", help="only count items to convert")
+    parser.add_argument("--restart", action="store_true", help="ignore the saved checkpoint")
+    args = parser.parse_args()
+
+    client = MongoClient(os.environ['MONGO_URL'])
+    try:
+        migrate(client[os.environ['DB_NAME']], args.batch_size, args.dry_run, args.restart)
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+import calendar
+import uuid
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+# Namespace for occurrence item ids: the same template and period always map
+# to the same item id, which is what makes materialization idempotent
+OCCURRENCE_NAMESPACE = uuid.UUID("6f1c4e9a-3b0d-4f59-9a7e-2d8c5b1e7a40")
+
+# Upper bound on occurrences materialized per template in one pass, so a
+# template with a start date far in the past cannot flood the ledger
+MAX_CATCH_UP = 400
+
+
+def occurrence_id(template_id: str, when: datetime) -> str:
+    return str(uuid.uuid5(OCCURRENCE_NAMESPACE, f"{template_id}:{when.date().isoformat()}"))
+
+
+def _monthly(template: dict, first: int):
+    start = template["startDate"]
+    day = template.get("dayOfMonth") or start.day
+    interval = template.get("interval") or 1
+    k = first
+    while True:
+        month_index = start.year * 12 + start.month - 1 + k * interval
+        year, month = divmod(month_index, 12)
+        month += 1
+        last_day = calendar.monthrange(year, month)[1]
+        yield start.replace(year=year, month=month, day=min(day, last_day))
+        k += 1
+
+
+def _weekly(template: dict, first: int):
+    start = template["startDate"]
+    weekday = template.get("weekday")
+    if weekday is None:
+        weekday = start.weekday()
+    step = timedelta(weeks=template.get("interval") or 1)
+    origin = start + timedelta(days=(weekday - start.weekday()) % 7)
+    k = first
+    while True:
+        yield origin + k * step
+        k += 1
+
+
+def occurrences(template: dict, after: Optional[datetime], until: datetime) -> List[datetime]:
+    """Dates the template falls due in the window (after, until], oldest first"""
+    start = template["startDate"]
+    end = template.get("endDate")
+    interval = template.get("interval") or 1
+
+    # Jump close to the window instead of walking from the start date
+    first = 0
+    if after is not None and after > start:
+        if template["frequency"] == "monthly":
+            months = (after.year - start.year) * 12 + after.month - start.month
+            first = max(0, months // interval - 1)
+        else:
+            first = max(0, (after - start).days // (7 * interval) - 1)
+
+    generate = _monthly if template["frequency"] == "monthly" else _weekly
+    due = []
+    for when in generate(template, first):
+        if when > until or (end is not None and when > end) or len(due) >= MAX_CATCH_UP:
+            break
+        if when < start or (after is not None and when <= after):
+            continue
+        due.append(when)
+    return due
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Rebuild items, balances or analytics from the latest snapshot plus the tail
+of the item event log, without scanning the live items collection.
+
+``--at`` rebuilds the state as it was at a point in time (from the last
+snapshot taken before it), for audits. ``--verify`` compares the rebuilt
+items with the live collection. ``--write`` stores the rebuilt items in a
+separate collection, replacing its contents.
+
+Usage:
+    python replay.py [items|balances|analytics] [--at 2026-01-31T23:59:59]
+        [--verify] [--write items_rebuilt]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from bson import ObjectId
+from dotenv import load_dotenv
+from pymongo import MongoClient
+
+from codec import decode_id, decode_item, from_minor, to_minor
+from events import replay
+from fx import get_rates
+from settlement import compute_balances
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+
+def rebuild(db, at=None):
+    """Items (id -> stored document) as of ``at``, or now"""
+    query = {"complete": True}
+    if at is not None:
+        query["startedAt"] = {"$lte": at}
+    snapshot = db.snapshots.find_one(query, sort=[("startedAt", -1)])
+
+    items = {}
+    events_query = {}
+    if snapshot is None:
+        print("no snapshot; replaying the whole event log", file=sys.stderr)
+    else:
+        for doc in db.snapshot_items.find({"snapshot": snapshot["_id"]}):
+            items[decode_id(doc["item"]["id"])] = doc["item"]
+        events_query["_id"] = {"$gte": snapshot["eventsFrom"]}
+    if at is not None:
+        # ObjectIds only carry whole seconds
+        events_query.setdefault("_id", {})["$lt"] = ObjectId.from_datetime(at + timedelta(seconds=1))
+
+    applied = replay(items, db.item_events.find(events_query))
+    source = f"snapshot {snapshot['_id']} ({snapshot['startedAt']:%Y-%m-%d %H:%M})" if snapshot else "empty state"
+    print(f"{len(items)} items from {source} + {applied} events", file=sys.stderr)
+    return items
+
+
+def base_amounts(items):
+    """Decoded items with their amounts in base-currency øre, converted in one pass"""
+    items = [decode_item(doc) for doc in items]
+    amounts = get_rates().convert(
+        [to_minor(item["amount"]) for item in items],
+        [item["currency"] for item in items],
+        [item["createdAt"] for item in items],
+    ).tolist()
+    return zip(items, amounts)
+
+
+def balances(db, items):
+    members = [user["id"] for user in db.users.find({}, {"id": 1})]
+    paid_by = {}
+    weighted = []
+    for item, amount in base_amounts(items.values()):
+        if item.get("type") != "expense" or not item.get("isDivided") or not item.get("paidBy"):
+            continue
+        if item.get("splitWeights") is None:
+            paid_by[item["paidBy"]] = paid_by.get(item["paidBy"], 0) + amount
+        else:
+            weighted.append((amount, item["paidBy"], item["splitWeights"]))
+    members += [payer for payer in paid_by if payer not in members]
+    return {
+        member: from_minor(amount)
+        for member, amount in compute_balances(members, paid_by, weighted).items()
+    }
+
+
+def analytics(items):
+    """Totals per month in the base currency: by type, and expenses by payer"""
+    months = {}
+    for item, amount in base_amounts(items.values()):
+        month = months.setdefault(item["createdAt"].strftime("%Y-%m"), {"cart": 0, "expense": 0, "paidBy": {}})
+        month[item.get("type", "cart")] += amount
+        if item.get("type") == "expense" and item.get("paidBy"):
+            month["paidBy"][item["paidBy"]] = month["paidBy"].get(item["paidBy"], 0) + amount
+    return {
+        key: {
+            "cart": from_minor(month["cart"]),
+            "expense": from_minor(month["expense"]),
+            "paidBy": {payer: from_minor(amount) for payer, amount in month["paidBy"].items()},
+        }
+        for key, month in sorted(months.items())
+    }
+
+
+def verify(db, items):
+    """Differences between rebuilt and live items; returns how many differ"""
+    live = {decode_id(doc["id"]): doc for doc in db.items.find({}, {"_id": 0, "fieldTimestamps": 0})}
+    missing = live.keys() - items.keys()
+    extra = items.keys() - live.keys()
+    # Compare decoded, so items the compact migration rewrote still match
+    changed = [
+        k for k in live.keys() & items.keys() if decode_item(live[k]) != decode_item(items[k])
+    ]
+    for label, ids in (("missing", missing), ("extra", extra), ("changed", changed)):
+        for item_id in sorted(ids)[:20]:
+            print(f"{label}: {item_id}", file=sys.stderr)
+    print(f"{len(missing)} missing, {len(extra)} extra, {len(changed)} changed", file=sys.stderr)
+    return len(missing) + len(extra) + len(changed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("view", nargs="?", choices=["items", "balances", "analytics"], default="items")
+    parser.add_argument("--at", type=datetime.fromisoformat, help="UTC time to rebuild the state at")
+    parser.add_argument("--verify", action="store_true", help="compare rebuilt items with the live collection")
+    parser.add_argument("--write", metavar="COLLECTION", help="store the rebuilt items in this collection")
+    args = parser.parse_args()
+    if args.write == "items":
+        parser.error("refusing to overwrite the live items collection")
+
+    client = MongoClient(os.environ['MONGO_URL'])
+    try:
+        db = client[os.environ['DB_NAME']]
+        started = time.perf_counter()
+        items = rebuild(db, args.at)
+        print(f"rebuilt in {time.perf_counter() - started:.2f}s", file=sys.stderr)
+
+        if args.view == "items":
+            counts = {}
+            for doc in items.values():
+                counts[doc.get("type", "cart")] = counts.get(doc.get("type", "cart"), 0) + 1
+            print(json.dumps({"count": len(items), "byType": counts}, indent=2))
+        elif args.view == "balances":
+            print(json.dumps(balances(db, items), indent=2))
+        elif args.view == "analytics":
+            print(json.dumps(analytics(items), indent=2))
+        if args.write:
+            db[args.write].delete_many({})
+            if items:
+                db[args.write].insert_many(list(items.values()))
+        if args.verify and verify(db, items):
+            sys.exit(1)
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    main()
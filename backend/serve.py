@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Production entry point: serve the API with one worker process per core.
+
+Each worker builds its own app through ``server:create_app``, so the Motor
+client is created after the worker process starts (never shared across a
+fork). Workers ping MongoDB to open their connection pool and ensure indexes
+before they accept traffic. On SIGTERM they stop accepting connections,
+finish in-flight requests (up to --graceful-timeout seconds) and close the
+pool.
+
+Usage:
+    python serve.py [--workers N] [--host 0.0.0.0] [--port 8001]
+
+Behind gunicorn the equivalent is:
+    WARM_UP_ON_STARTUP=1 gunicorn 'server:create_app()' -k uvicorn.workers.UvicornWorker -w N
+"""
+
+import argparse
+import os
+
+import uvicorn
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--graceful-timeout", type=int, default=30)
+    args = parser.parse_args()
+
+    os.environ.setdefault("WARM_UP_ON_STARTUP", "1")
+    os.environ.setdefault("MONGO_MIN_POOL_SIZE", "4")
+
+    uvicorn.run(
+        "server:create_app",
+        factory=True,
+        app_dir=os.path.dirname(os.path.abspath(__file__)),
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        timeout_graceful_shutdown=args.graceful_timeout,
+        proxy_headers=True,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,30 +1,93 @@
-from fastapi import FastAPI, APIRouter, HTTPException
+from fastapi import FastAPI, APIRouter, HTTPException, Header, Query, Request
+from fastapi.responses import Response, StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorGridFSBucket
 import os
+import asyncio
 import logging
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
 from pathlib import Path
-from pydantic import BaseModel, Field
-from typing import List, Optional, Literal
+from pydantic import AfterValidator, BaseModel, Field
+from typing import Annotated, Dict, List, Optional, Literal
 import uuid
-from datetime import datetime
+from datetime import datetime, timedelta
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from bson import ObjectId
+from bson.int64 import Int64
+from bson.errors import InvalidId
+from gridfs.errors import NoFile
+
+from admission import AdmissionController, AdmissionMiddleware
+from attachments import RangeNotSatisfiable, make_thumbnail, parse_range, stream_file
+from fx import get_rates
+from events import (
+    SNAPSHOT_OVERLAP_SECONDS, creation_event, deletion_event, diff_events, update_event,
+)
+from budgets import HOUSEHOLD, crossed, month_key, spending_deltas, total_key
+from codec import (
+    BASE_CURRENCY, decode_id, decode_item, encode_fields, encode_update, from_minor, id_query,
+    ids_query, sum_by_id, to_minor, version_filter,
+)
+from idempotency import IdempotencyMiddleware
+from recurring import MAX_CATCH_UP, occurrence_id, occurrences
+from settlement import EXACT_MAX_MEMBERS, compute_balances, settle
+from singleflight import SingleFlight
+from sync import merge_mutations, utc_naive
 
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
-
-# Create the main app without a prefix
-app = FastAPI()
+# MongoDB connection, opened on startup rather than at import time
+client = None
+db = None
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
 
+# Concurrent identical read queries share a single database round trip
+reads = SingleFlight()
+
+# Caps in-flight database work; see AdmissionController
+admission = AdmissionController(
+    limit=int(os.environ.get('ADMISSION_MAX_CONCURRENCY', 32)),
+    max_queue=int(os.environ.get('ADMISSION_MAX_QUEUE', 64)),
+    queue_timeout=float(os.environ.get('ADMISSION_QUEUE_TIMEOUT_MS', 2000)) / 1000,
+)
+
+
+# Receipt images are streamed into GridFS, never stored on the item itself
+ATTACHMENT_MAX_BYTES = int(os.environ.get('ATTACHMENT_MAX_BYTES', 15 * 1024 * 1024))
+
+# Uploads and downloads hold their slot for as long as the client's connection
+# takes to move the file, so they are admitted from a small pool of their own
+# and slow transfers cannot starve database work
+ATTACHMENT_TRANSFERS = (
+    r"^(POST /api/items/[^/]+/attachments"
+    r"|GET /api/items/[^/]+/attachments/[^/]+(/thumbnail)?)$"
+)
+attachment_admission = AdmissionController(
+    limit=int(os.environ.get('ATTACHMENT_MAX_CONCURRENCY', 8)),
+    max_queue=int(os.environ.get('ATTACHMENT_MAX_QUEUE', 16)),
+    queue_timeout=admission.queue_timeout,
+)
+thumbnail_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="thumbnails")
+
+
+def known_currency(code: str) -> str:
+    code = code.upper()
+    if code not in get_rates().currencies:
+        raise ValueError(f"No exchange rates for {code}")
+    return code
+
+# A currency code the rates file can convert into the base currency
+Currency = Annotated[str, AfterValidator(known_currency)]
+
 
 # Define Models
 class User(BaseModel):
@@ -34,32 +97,275 @@ class User(BaseModel):
 class UserCreate(BaseModel):
     name: str
 
+class UsersInit(BaseModel):
+    names: List[str] = Field(default_factory=lambda: ["Matias", "Agustina"], min_length=1)
+
+
+class AttachmentMeta(BaseModel):
+    id: str  # GridFS file id
+    filename: str
+    contentType: str
+    length: int
+    thumbnailId: Optional[str] = None
+    uploadedAt: datetime = Field(default_factory=datetime.utcnow)
+
 
 class Item(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     name: str
     amount: float
-    currency: str = "DKK"
+    currency: str = BASE_CURRENCY  # the amount is stored in the currency it was paid in
     type: Literal["cart", "expense"] = "cart"
     paidBy: Optional[str] = None  # userId who paid
     isDivided: bool = False  # Whether expense was divided/split
+    splitWeights: Optional[Dict[str, float]] = None  # userId -> weight; unset or {} splits equally
     createdAt: datetime = Field(default_factory=datetime.utcnow)
     createdBy: str  # userId who created
+    version: int = 0  # bumped on every write, for optimistic concurrency
+    recurringId: Optional[str] = None  # template this occurrence came from
+    attachments: List[AttachmentMeta] = []  # metadata only; content lives in GridFS
     
 class ItemCreate(BaseModel):
     name: str
     amount: float
+    currency: Currency = BASE_CURRENCY
     type: Literal["cart", "expense"] = "cart"
     paidBy: Optional[str] = None
     createdBy: str
     isDivided: bool = False
+    splitWeights: Optional[Dict[str, float]] = None
 
 class ItemUpdate(BaseModel):
     name: Optional[str] = None
     amount: Optional[float] = None
+    currency: Optional[Currency] = None
     type: Optional[Literal["cart", "expense"]] = None
     paidBy: Optional[str] = None
     isDivided: Optional[bool] = None
+    splitWeights: Optional[Dict[str, float]] = None
+    version: Optional[int] = None  # expected current version; rejects stale writes
+
+
+class RecurringCreate(BaseModel):
+    name: str
+    amount: float
+    currency: Currency = BASE_CURRENCY
+    paidBy: Optional[str] = None
+    createdBy: str
+    isDivided: bool = False
+    frequency: Literal["monthly", "weekly"]
+    interval: int = Field(1, ge=1)  # every N months/weeks
+    dayOfMonth: Optional[int] = Field(None, ge=1, le=31)  # monthly; clamped to month length
+    weekday: Optional[int] = Field(None, ge=0, le=6)  # weekly; Monday is 0
+    startDate: datetime
+    endDate: Optional[datetime] = None
+
+class RecurringTemplate(RecurringCreate):
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    createdAt: datetime = Field(default_factory=datetime.utcnow)
+    materializedThrough: Optional[datetime] = None  # occurrences up to here exist
+
+
+# Alert thresholds are fractions of the limit; past 10x it an alert is noise
+MAX_BUDGET_THRESHOLD = 10.0
+Threshold = Annotated[float, Field(gt=0, le=MAX_BUDGET_THRESHOLD)]
+
+class BudgetCreate(BaseModel):
+    userId: Optional[str] = None  # None budgets the whole household
+    limit: float = Field(gt=0)  # per calendar month
+    thresholds: List[Threshold] = Field([0.8, 1.0], min_length=1)  # each raises an alert
+
+class Budget(BudgetCreate):
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    createdAt: datetime = Field(default_factory=datetime.utcnow)
+
+class BudgetStatus(BaseModel):
+    budget: Budget
+    month: str  # YYYY-MM
+    spent: float
+    remaining: float
+    ratio: float  # spent / limit
+
+class BudgetAlert(BaseModel):
+    id: str  # budget, month and threshold; one alert per crossing
+    budgetId: str
+    userId: Optional[str] = None
+    month: str
+    threshold: float
+    spent: float  # when the threshold was crossed
+    limit: float
+    createdAt: datetime
+    acknowledged: bool = False
+
+
+class Totals(BaseModel):
+    currency: str = BASE_CURRENCY  # every total is converted into this
+    total: float  # sum over the items in the view
+    count: int
+    expenseTotal: float
+    dividedTotal: float
+    paidBy: Dict[str, float]  # expense total per paying userId
+
+class Bootstrap(BaseModel):
+    users: List[User]
+    items: List[Item]
+    totals: Totals
+
+
+class Transfer(BaseModel):
+    fromUser: str
+    toUser: str
+    amount: float
+
+class Settlement(BaseModel):
+    mode: Literal["greedy", "exact"]  # solver that produced the transfers
+    balances: Dict[str, float]  # per userId; positive means they are owed money
+    transfers: List[Transfer]
+
+
+class SyncMutation(BaseModel):
+    clientId: str  # client-generated mutation id, used to drop replays
+    clientTimestamp: datetime
+    op: Literal["create", "update", "delete"]
+    itemId: str  # client-generated for creates
+    item: Optional[ItemCreate] = None  # required for create
+    changes: Optional[ItemUpdate] = None  # required for update
+
+class SyncRequest(BaseModel):
+    mutations: List[SyncMutation] = Field(max_length=500)
+
+class SyncResult(BaseModel):
+    clientId: str
+    itemId: str
+    # conflict: the item kept changing under the merge; resend the mutation
+    status: Literal["applied", "duplicate", "stale", "not_found", "conflict"]
+
+class SyncResponse(BaseModel):
+    results: List[SyncResult]
+    items: List[Item]  # canonical state of every item the batch touched
+
+
+def stamp_fields(update_data: dict, unset=()) -> dict:
+    """Record when each field was last written, for last-writer-wins sync"""
+    now = datetime.utcnow()
+    return {**update_data, **{f"fieldTimestamps.{k}": now for k in [*update_data, *unset]}}
+
+
+def item_update(fields: dict, unset=()) -> dict:
+    """Update document writing ``fields``, removing ``unset`` and bumping the version"""
+    update = {"$set": stamp_fields(fields, unset), "$inc": {"version": 1}}
+    if unset:
+        update["$unset"] = {k: "" for k in unset}
+    return update
+
+
+def to_item(doc: dict) -> Item:
+    return Item(**decode_item(doc))
+
+
+def item_query(item_id: str) -> dict:
+    return {"id": id_query(item_id)}
+
+
+# Item writes and their event-log entries commit together in a transaction
+# when the deployment supports them (replica set or sharded cluster); on a
+# standalone server the event is appended straight after the write.
+transactions_supported = None
+
+async def in_transaction(fn):
+    """Run ``fn(session)``, inside a retried transaction when possible"""
+    global transactions_supported
+    if transactions_supported is None:
+        try:
+            hello = await client.admin.command("hello")
+            transactions_supported = "setName" in hello or hello.get("msg") == "isdbgrid"
+        except Exception:
+            transactions_supported = False
+    try:
+        if not transactions_supported:
+            return await fn(None)
+        async with await client.start_session() as session:
+            return await session.with_transaction(fn)
+    finally:
+        # Reads from here on must not join a load that started before the write
+        reads.invalidate()
+
+
+def applied(before: dict, fields: dict, unset=()) -> dict:
+    """The document ``item_update(fields, unset)`` turns ``before`` into"""
+    after = {**before, **fields, "version": (before.get("version") or 0) + 1}
+    for key in unset:
+        after.pop(key, None)
+    return after
+
+
+async def track_spending(changes, session=None):
+    """Move the budget running totals by what (before, after) item pairs changed.
+
+    Raises an alert for every budget threshold the new totals went up through.
+    """
+    deltas = spending_deltas(changes)
+    if not deltas:
+        return
+    increased = []
+    for key, delta in deltas.items():
+        month, scope = key.split(":", 1)
+        total = await db.budget_totals.find_one_and_update(
+            {"_id": key},
+            {"$inc": {"spent": Int64(delta)}, "$setOnInsert": {"month": month, "scope": scope}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+            session=session,
+        )
+        if delta > 0:
+            increased.append((month, scope, total["spent"] - delta, total["spent"]))
+    if not increased:
+        return
+
+    scopes = {scope: None if scope == HOUSEHOLD else scope for _, scope, _, _ in increased}
+    budgets = {
+        budget.get("userId") or HOUSEHOLD: budget
+        for budget in await db.budgets.find(
+            {"userId": {"$in": list(scopes.values())}}, session=session
+        ).to_list(None)
+    }
+    now = datetime.utcnow()
+    for month, scope, old, new in increased:
+        budget = budgets.get(scope)
+        if not budget:
+            continue
+        for threshold in crossed(budget["limit"], budget["thresholds"], old, new):
+            alert_id = f"{budget['id']}:{month}:{threshold}"
+            # Upsert rather than insert: a duplicate key would abort the transaction
+            await db.budget_alerts.update_one(
+                {"_id": alert_id},
+                {"$setOnInsert": {
+                    "budgetId": budget["id"],
+                    "userId": budget.get("userId"),
+                    "month": month,
+                    "threshold": threshold,
+                    "spent": from_minor(new),
+                    "limit": budget["limit"],
+                    "createdAt": now,
+                    "acknowledged": False,
+                }},
+                upsert=True,
+                session=session,
+            )
+
+
+async def item_conflict(item_id: str) -> HTTPException:
+    """404 if the item is gone, otherwise 409 carrying its current state"""
+    current = await db.items.find_one(item_query(item_id))
+    if not current:
+        return HTTPException(status_code=404, detail="Item not found")
+    return HTTPException(
+        status_code=409,
+        detail={
+            "message": "Item was modified by someone else",
+            "current": to_item(current).model_dump(mode="json"),
+        },
+    )
 
 
 # Health check endpoint
@@ -68,10 +374,29 @@ async def root():
     return {"message": "Shared Expense Tracker API"}
 
 
+@api_router.get("/metrics/admission")
+async def admission_metrics():
+    return {**admission.snapshot(), "attachments": attachment_admission.snapshot()}
+
+
+async def load_users() -> List[dict]:
+    return await reads.do(("users",), lambda: db.users.find().to_list(100))
+
+
+async def load_items(type: Optional[str] = None) -> List[dict]:
+    query = {}
+    if type:
+        query["type"] = type
+    return await reads.do(
+        ("items", type),
+        lambda: db.items.find(query).sort("createdAt", -1).to_list(1000),
+    )
+
+
 # User endpoints
 @api_router.get("/users", response_model=List[User])
 async def get_users():
-    users = await db.users.find().to_list(100)
+    users = await load_users()
     return [User(**user) for user in users]
 
 
@@ -85,13 +410,14 @@ async def create_user(input: UserCreate):
     user_dict = input.model_dump()
     user_obj = User(**user_dict)
     await db.users.insert_one(user_obj.model_dump())
+    reads.invalidate()
     return user_obj
 
 
 @api_router.post("/users/init")
-async def init_users():
-    """Initialize the two default users: Matias and Agustina"""
-    users_to_create = ["Matias", "Agustina"]
+async def init_users(input: Optional[UsersInit] = None):
+    """Initialize the household members (by default Matias and Agustina)"""
+    users_to_create = (input or UsersInit()).names
     created_users = []
     
     for name in users_to_create:
@@ -101,6 +427,7 @@ async def init_users():
         else:
             user_obj = User(name=name)
             await db.users.insert_one(user_obj.model_dump())
+            reads.invalidate()
             created_users.append(user_obj)
     
     return {"users": [u.model_dump() for u in created_users]}
@@ -109,91 +436,839 @@ async def init_users():
 # Item endpoints
 @api_router.get("/items", response_model=List[Item])
 async def get_items(type: Optional[str] = None):
-    query = {}
-    if type:
-        query["type"] = type
-    items = await db.items.find(query).sort("createdAt", -1).to_list(1000)
-    return [Item(**item) for item in items]
+    items = await load_items(type)
+    return [to_item(item) for item in items]
 
 
 @api_router.post("/items", response_model=Item)
 async def create_item(input: ItemCreate):
     item_dict = input.model_dump()
     item_obj = Item(**item_dict)
-    await db.items.insert_one(item_obj.model_dump())
-    return item_obj
+    doc = encode_fields(item_obj.model_dump())
+
+    async def write(session):
+        await db.items.insert_one(doc, session=session)
+        await db.item_events.insert_one(creation_event(doc), session=session)
+        await track_spending([(None, doc)], session)
+
+    await in_transaction(write)
+    # Answer with what was stored (amount rounded to øre), not the raw input
+    return to_item(doc)
 
 
 @api_router.get("/items/{item_id}", response_model=Item)
 async def get_item(item_id: str):
-    item = await db.items.find_one({"id": item_id})
+    item = await db.items.find_one(item_query(item_id))
     if not item:
         raise HTTPException(status_code=404, detail="Item not found")
-    return Item(**item)
+    return to_item(item)
 
 
 @api_router.put("/items/{item_id}", response_model=Item)
 async def update_item(item_id: str, input: ItemUpdate):
-    item = await db.items.find_one({"id": item_id})
-    if not item:
-        raise HTTPException(status_code=404, detail="Item not found")
-    
+    query = item_query(item_id)
+    if input.version is not None:
+        query["version"] = version_filter(input.version)
+
     # Update only provided fields
-    update_data = {k: v for k, v in input.model_dump().items() if v is not None}
-    
-    if update_data:
-        await db.items.update_one({"id": item_id}, {"$set": update_data})
-    
-    updated_item = await db.items.find_one({"id": item_id})
-    return Item(**updated_item)
+    update_data = {
+        k: v for k, v in input.model_dump(exclude={"version"}).items() if v is not None
+    }
+
+    if not update_data:
+        item = await db.items.find_one(query)
+        if not item:
+            raise await item_conflict(item_id)
+        return to_item(item)
+
+    fields, unset = encode_update(update_data)
+
+    async def write(session):
+        # The old values are needed to move the budget totals; the result is
+        # rebuilt from them instead of reading the document a second time
+        before = await db.items.find_one_and_update(
+            query, item_update(fields, unset), session=session
+        )
+        if not before:
+            return None
+        updated = applied(before, fields, unset)
+        await db.item_events.insert_one(update_event(updated, [*fields, *unset]), session=session)
+        await track_spending([(before, updated)], session)
+        return updated
+
+    updated_item = await in_transaction(write)
+    if not updated_item:
+        raise await item_conflict(item_id)
+    return to_item(updated_item)
 
 
 @api_router.delete("/items/{item_id}")
 async def delete_item(item_id: str):
-    result = await db.items.delete_one({"id": item_id})
-    if result.deleted_count == 0:
+    async def write(session):
+        deleted = await db.items.find_one_and_delete(item_query(item_id), session=session)
+        if deleted:
+            await db.item_events.insert_one(deletion_event(deleted), session=session)
+            await track_spending([(deleted, None)], session)
+        return deleted
+
+    item = await in_transaction(write)
+    if not item:
         raise HTTPException(status_code=404, detail="Item not found")
+    await delete_attachment_files(item.get("attachments", []))
     return {"message": "Item deleted successfully"}
 
 
 @api_router.put("/items/{item_id}/toggle-divided", response_model=Item)
 async def toggle_divided(item_id: str):
-    item = await db.items.find_one({"id": item_id})
-    if not item:
+    # Flip server-side so concurrent toggles never read-modify-write a stale value
+    async def write(session):
+        updated = await db.items.find_one_and_update(
+            item_query(item_id),
+            [{"$set": {
+                "isDivided": {"$not": ["$isDivided"]},
+                "fieldTimestamps.isDivided": "$$NOW",
+                "version": {"$add": [{"$ifNull": ["$version", 0]}, 1]},
+            }}],
+            return_document=ReturnDocument.AFTER,
+            session=session,
+        )
+        if updated:
+            await db.item_events.insert_one(update_event(updated, ["isDivided"]), session=session)
+        return updated
+
+    updated_item = await in_transaction(write)
+    if not updated_item:
         raise HTTPException(status_code=404, detail="Item not found")
-    
-    new_divided = not item.get("isDivided", False)
-    await db.items.update_one({"id": item_id}, {"$set": {"isDivided": new_divided}})
-    
-    updated_item = await db.items.find_one({"id": item_id})
-    return Item(**updated_item)
+    return to_item(updated_item)
 
 
 @api_router.put("/items/{item_id}/move-to-expense", response_model=Item)
 async def move_to_expense(item_id: str, paid_by: str):
-    item = await db.items.find_one({"id": item_id})
+    fields = encode_fields({"type": "expense", "paidBy": paid_by})
+
+    async def write(session):
+        before = await db.items.find_one_and_update(
+            item_query(item_id), item_update(fields), session=session
+        )
+        if not before:
+            return None
+        updated = applied(before, fields)
+        await db.item_events.insert_one(update_event(updated, fields), session=session)
+        await track_spending([(before, updated)], session)
+        return updated
+
+    updated_item = await in_transaction(write)
+    if not updated_item:
+        raise HTTPException(status_code=404, detail="Item not found")
+    return to_item(updated_item)
+
+
+# Attachment endpoints
+def attachments_bucket() -> AsyncIOMotorGridFSBucket:
+    return AsyncIOMotorGridFSBucket(db, bucket_name="attachments")
+
+
+async def delete_attachment_files(attachments: List[dict]):
+    if not attachments:
+        return
+    bucket = attachments_bucket()
+    for attachment in attachments:
+        for file_id in (attachment.get("id"), attachment.get("thumbnailId")):
+            if file_id:
+                try:
+                    await bucket.delete(ObjectId(file_id))
+                except NoFile:
+                    pass
+
+
+async def serve_file(item_id: str, file_id: str, range_header: Optional[str]):
+    try:
+        grid_out = await attachments_bucket().open_download_stream(ObjectId(file_id))
+    except (InvalidId, NoFile):
+        raise HTTPException(status_code=404, detail="Attachment not found")
+    metadata = grid_out.metadata or {}
+    if metadata.get("itemId") != item_id:
+        raise HTTPException(status_code=404, detail="Attachment not found")
+
+    length = grid_out.length
+    try:
+        requested = parse_range(range_header, length)
+    except RangeNotSatisfiable:
+        return Response(status_code=416, headers={"Content-Range": f"bytes */{length}"})
+
+    start, end = requested or (0, length - 1)
+    headers = {
+        "Accept-Ranges": "bytes",
+        "Content-Length": str(end - start + 1),
+        # Attachments never change once uploaded
+        "Cache-Control": "private, max-age=31536000, immutable",
+    }
+    if requested:
+        headers["Content-Range"] = f"bytes {start}-{end}/{length}"
+    return StreamingResponse(
+        stream_file(grid_out, start, end),
+        status_code=206 if requested else 200,
+        media_type=metadata.get("contentType", "application/octet-stream"),
+        headers=headers,
+    )
+
+
+@api_router.get("/items/{item_id}/attachments", response_model=List[AttachmentMeta])
+async def get_attachments(item_id: str):
+    item = await db.items.find_one(item_query(item_id), {"attachments": 1})
     if not item:
         raise HTTPException(status_code=404, detail="Item not found")
-    
-    await db.items.update_one(
-        {"id": item_id}, 
-        {"$set": {"type": "expense", "paidBy": paid_by}}
+    return item.get("attachments", [])
+
+
+@api_router.post("/items/{item_id}/attachments", response_model=AttachmentMeta)
+async def upload_attachment(item_id: str, request: Request, filename: str = "receipt"):
+    """Stream the raw request body into GridFS; send the file's Content-Type"""
+    if not await db.items.find_one(item_query(item_id), {"_id": 1}):
+        raise HTTPException(status_code=404, detail="Item not found")
+
+    content_type = request.headers.get("content-type", "application/octet-stream")
+    is_image = content_type.startswith("image/")
+    bucket = attachments_bucket()
+    grid_in = bucket.open_upload_stream(
+        filename, metadata={"itemId": item_id, "contentType": content_type}
     )
-    
-    updated_item = await db.items.find_one({"id": item_id})
-    return Item(**updated_item)
 
+    # Images are also spooled (to disk past 1 MB) for the thumbnail step
+    with tempfile.SpooledTemporaryFile(max_size=1024 * 1024) as spool:
+        length = 0
+        try:
+            async for chunk in request.stream():
+                length += len(chunk)
+                if length > ATTACHMENT_MAX_BYTES:
+                    raise HTTPException(status_code=413, detail="Attachment too large")
+                await grid_in.write(chunk)
+                if is_image:
+                    spool.write(chunk)
+        except BaseException:
+            await grid_in.abort()
+            raise
+        await grid_in.close()
 
-# Include the router in the main app
-app.include_router(api_router)
+        thumbnail_id = None
+        if is_image:
+            loop = asyncio.get_running_loop()
+            thumbnail = await loop.run_in_executor(thumbnail_pool, make_thumbnail, spool)
+            if thumbnail:
+                thumbnail_id = await bucket.upload_from_stream(
+                    f"{filename}.thumbnail.jpg",
+                    thumbnail,
+                    metadata={"itemId": item_id, "contentType": "image/jpeg"},
+                )
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_credentials=True,
-    allow_origins=["*"],
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+    attachment = AttachmentMeta(
+        id=str(grid_in._id),
+        filename=filename,
+        contentType=content_type,
+        length=length,
+        thumbnailId=str(thumbnail_id) if thumbnail_id else None,
+    )
+    async def write(session):
+        updated = await db.items.find_one_and_update(
+            item_query(item_id),
+            {"$push": {"attachments": attachment.model_dump()}, "$inc": {"version": 1}},
+            projection={"id": 1, "version": 1, "attachments": 1},
+            return_document=ReturnDocument.AFTER,
+            session=session,
+        )
+        if updated:
+            await db.item_events.insert_one(update_event(updated, ["attachments"]), session=session)
+        return updated
+
+    if not await in_transaction(write):
+        # The item was deleted while we were uploading
+        await delete_attachment_files([attachment.model_dump()])
+        raise HTTPException(status_code=404, detail="Item not found")
+    return attachment
+
+
+@api_router.get("/items/{item_id}/attachments/{attachment_id}")
+async def download_attachment(item_id: str, attachment_id: str, range: Optional[str] = Header(None)):
+    return await serve_file(item_id, attachment_id, range)
+
+
+@api_router.get("/items/{item_id}/attachments/{attachment_id}/thumbnail")
+async def download_thumbnail(item_id: str, attachment_id: str, range: Optional[str] = Header(None)):
+    item = await db.items.find_one(
+        {**item_query(item_id), "attachments.id": attachment_id}, {"attachments.$": 1}
+    )
+    if not item or not item["attachments"][0].get("thumbnailId"):
+        raise HTTPException(status_code=404, detail="Thumbnail not found")
+    return await serve_file(item_id, item["attachments"][0]["thumbnailId"], range)
+
+
+@api_router.delete("/items/{item_id}/attachments/{attachment_id}")
+async def delete_attachment(item_id: str, attachment_id: str):
+    async def write(session):
+        updated = await db.items.find_one_and_update(
+            {**item_query(item_id), "attachments.id": attachment_id},
+            {"$pull": {"attachments": {"id": attachment_id}}, "$inc": {"version": 1}},
+            projection={"id": 1, "version": 1, "attachments": 1},
+            session=session,
+        )
+        if updated:
+            after = {
+                **updated,
+                "version": (updated.get("version") or 0) + 1,
+                "attachments": [a for a in updated["attachments"] if a["id"] != attachment_id],
+            }
+            await db.item_events.insert_one(update_event(after, ["attachments"]), session=session)
+        return updated
+
+    item = await in_transaction(write)
+    if not item:
+        raise HTTPException(status_code=404, detail="Attachment not found")
+    await delete_attachment_files(
+        [a for a in item["attachments"] if a["id"] == attachment_id]
+    )
+    return {"message": "Attachment deleted successfully"}
+
+
+# Recurring expense endpoints
+@api_router.get("/recurring", response_model=List[RecurringTemplate])
+async def get_recurring():
+    templates = await db.recurring.find().sort("createdAt", -1).to_list(1000)
+    return [RecurringTemplate(**decode_item(t)) for t in templates]
+
+
+@api_router.post("/recurring", response_model=RecurringTemplate)
+async def create_recurring(input: RecurringCreate):
+    template = RecurringTemplate(
+        **input.model_dump(exclude={"startDate", "endDate"}),
+        startDate=utc_naive(input.startDate),
+        endDate=utc_naive(input.endDate) if input.endDate else None,
+    )
+    await db.recurring.insert_one(
+        encode_fields(template.model_dump(exclude={"materializedThrough"}))
+    )
+    # Anything already due (including a start date in the past) shows up now
+    await materialize_recurring({"id": id_query(template.id)})
+    doc = await db.recurring.find_one({"id": id_query(template.id)})
+    return RecurringTemplate(**decode_item(doc))
+
+
+@api_router.delete("/recurring/{template_id}")
+async def delete_recurring(template_id: str):
+    # Occurrences already created stay in the ledger
+    result = await db.recurring.delete_one({"id": id_query(template_id)})
+    if result.deleted_count == 0:
+        raise HTTPException(status_code=404, detail="Recurring expense not found")
+    return {"message": "Recurring expense deleted successfully"}
+
+
+async def materialize_recurring(query: Optional[dict] = None) -> int:
+    """Create every occurrence that has fallen due, in one bulk insert.
+
+    Occurrence ids are derived from the template and period, so running this
+    concurrently from several workers, or again after a crash, never creates
+    the same occurrence twice: the unique index on items.id drops repeats.
+    """
+    now = datetime.utcnow()
+    templates = await db.recurring.find(
+        {**(query or {}), "startDate": {"$lte": now}}
+    ).to_list(None)
+
+    new_items = []
+    progress = []
+    for doc in templates:
+        template = decode_item(doc)
+        due = occurrences(template, template.get("materializedThrough"), now)
+        for when in due:
+            item = Item(
+                id=occurrence_id(template["id"], when),
+                name=template["name"],
+                amount=template["amount"],
+                currency=template["currency"],
+                type="expense",
+                paidBy=template.get("paidBy"),
+                isDivided=template.get("isDivided", False),
+                createdAt=when,
+                createdBy=template["createdBy"],
+                recurringId=template["id"],
+            )
+            new_items.append(encode_fields(item.model_dump()))
+        # A capped catch-up resumes from the last occurrence on the next pass
+        through = due[-1] if len(due) >= MAX_CATCH_UP else now
+        progress.append(UpdateOne(
+            {"_id": doc["_id"]}, {"$max": {"materializedThrough": through}}
+        ))
+
+    inserted = []
+    if new_items:
+        try:
+            await db.items.insert_many(new_items, ordered=False)
+            inserted = new_items
+        except BulkWriteError as e:
+            # Duplicate ids are occurrences another worker already created
+            if any(err["code"] != 11000 for err in e.details["writeErrors"]):
+                raise
+            failed = {err["index"] for err in e.details["writeErrors"]}
+            inserted = [doc for i, doc in enumerate(new_items) if i not in failed]
+        finally:
+            reads.invalidate()
+    if inserted:
+        # Not transactional: duplicates are expected here and would abort one
+        await db.item_events.insert_many(
+            [creation_event(doc) for doc in inserted], ordered=False
+        )
+        await track_spending([(None, doc) for doc in inserted])
+    if progress:
+        await db.recurring.bulk_write(progress, ordered=False)
+    return len(inserted)
+
+
+async def recurring_scheduler():
+    while True:
+        try:
+            created = await materialize_recurring()
+            if created:
+                logger.info("Created %d recurring expenses", created)
+        except Exception:
+            logger.exception("Recurring expense run failed")
+        await asyncio.sleep(RECURRING_INTERVAL_SECONDS)
+
+
+# Budget endpoints
+MONTH_PATTERN = r"^\d{4}-(0[1-9]|1[0-2])$"
+
+@api_router.get("/budgets", response_model=List[Budget])
+async def get_budgets():
+    budgets = await db.budgets.find().to_list(100)
+    return [Budget(**budget) for budget in budgets]
+
+
+@api_router.post("/budgets", response_model=Budget)
+async def set_budget(input: BudgetCreate):
+    """Create or replace the monthly budget of a user, or of the household"""
+    new = Budget(**input.model_dump())
+    budget = await db.budgets.find_one_and_update(
+        {"userId": input.userId},
+        {
+            "$set": {"limit": input.limit, "thresholds": input.thresholds},
+            "$setOnInsert": {"id": new.id, "userId": input.userId, "createdAt": new.createdAt},
+        },
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    return Budget(**budget)
+
+
+@api_router.delete("/budgets/{budget_id}")
+async def delete_budget(budget_id: str):
+    result = await db.budgets.delete_one({"id": budget_id})
+    if result.deleted_count == 0:
+        raise HTTPException(status_code=404, detail="Budget not found")
+    return {"message": "Budget deleted successfully"}
+
+
+@api_router.get("/budgets/status", response_model=List[BudgetStatus])
+async def budget_status(month: Optional[str] = Query(None, pattern=MONTH_PATTERN)):
+    """Spending against every budget for a month (default: the current one).
+
+    Reads one running total per budget; no items are scanned.
+    """
+    month = month or month_key(datetime.utcnow())
+    budgets = await db.budgets.find().to_list(100)
+    keys = [total_key(month, budget.get("userId")) for budget in budgets]
+    spent = {
+        total["_id"]: total["spent"]
+        for total in await db.budget_totals.find({"_id": {"$in": keys}}).to_list(None)
+    }
+
+    statuses = []
+    for budget, key in zip(budgets, keys):
+        budget = Budget(**budget)
+        amount = from_minor(spent.get(key, 0))
+        statuses.append(BudgetStatus(
+            budget=budget,
+            month=month,
+            spent=amount,
+            remaining=from_minor(to_minor(budget.limit) - to_minor(amount)),
+            ratio=amount / budget.limit,
+        ))
+    return statuses
+
+
+@api_router.get("/budgets/alerts", response_model=List[BudgetAlert])
+async def budget_alerts(
+    month: Optional[str] = Query(None, pattern=MONTH_PATTERN),
+    include_acknowledged: bool = False,
+):
+    query = {}
+    if month:
+        query["month"] = month
+    if not include_acknowledged:
+        query["acknowledged"] = False
+    alerts = await db.budget_alerts.find(query).sort("createdAt", -1).to_list(1000)
+    return [BudgetAlert(id=alert.pop("_id"), **alert) for alert in alerts]
+
+
+@api_router.put("/budgets/alerts/{alert_id}/acknowledge", response_model=BudgetAlert)
+async def acknowledge_alert(alert_id: str):
+    alert = await db.budget_alerts.find_one_and_update(
+        {"_id": alert_id},
+        {"$set": {"acknowledged": True}},
+        return_document=ReturnDocument.AFTER,
+    )
+    if not alert:
+        raise HTTPException(status_code=404, detail="Alert not found")
+    return BudgetAlert(id=alert.pop("_id"), **alert)
+
+
+@api_router.post("/budgets/recompute")
+async def recompute_budget_totals(month: str = Query(..., pattern=MONTH_PATTERN)):
+    """Re-sum one month's running totals from the items.
+
+    A repair tool for totals that drifted (e.g. a standalone server crashing
+    between an item write and its $inc). Writes landing while it runs can be
+    lost from the totals, so run it when the ledger is quiet.
+    """
+    start = datetime.strptime(month, "%Y-%m")
+    end = start.replace(year=start.year + start.month // 12, month=start.month % 12 + 1)
+    rows = await db.items.aggregate([
+        {"$match": {"type": "expense", "createdAt": {"$gte": start, "$lt": end}}},
+        {"$group": {"_id": "$paidBy", "spent": {"$sum": get_rates().amount_expr(start, end)}}},
+    ]).to_list(None)
+
+    totals = {total_key(month, None): sum(row["spent"] for row in rows)}
+    for payer, spent in sum_by_id(rows, "spent").items():
+        if payer:
+            totals[total_key(month, payer)] = spent
+    await db.budget_totals.update_many({"month": month}, {"$set": {"spent": Int64(0)}})
+    await db.budget_totals.bulk_write([
+        UpdateOne(
+            {"_id": key},
+            {"$set": {"spent": Int64(spent), "month": month, "scope": key.split(":", 1)[1]}},
+            upsert=True,
+        )
+        for key, spent in totals.items()
+    ])
+    return {"month": month, "totals": {key: from_minor(spent) for key, spent in totals.items()}}
+
+
+# Snapshots of the items collection; derived state is rebuilt from the latest
+# one plus the event-log tail (see replay.py)
+async def take_snapshot(period: int) -> Optional[ObjectId]:
+    """Copy every item into snapshot_items; None if this period already has one.
+
+    The unique index on snapshots.period lets exactly one worker take each
+    period's snapshot.
+    """
+    started = datetime.utcnow()
+    try:
+        result = await db.snapshots.insert_one({
+            "period": period,
+            "startedAt": started,
+            "eventsFrom": ObjectId.from_datetime(started - timedelta(seconds=SNAPSHOT_OVERLAP_SECONDS)),
+            "complete": False,
+        })
+    except DuplicateKeyError:
+        return None
+    snapshot_id = result.inserted_id
+
+    count = 0
+    batch = []
+    async for doc in db.items.find({}, {"_id": 0, "fieldTimestamps": 0}):
+        batch.append({"snapshot": snapshot_id, "item": doc})
+        if len(batch) >= SNAPSHOT_BATCH_SIZE:
+            await db.snapshot_items.insert_many(batch)
+            count += len(batch)
+            batch = []
+    if batch:
+        await db.snapshot_items.insert_many(batch)
+        count += len(batch)
+    await db.snapshots.update_one(
+        {"_id": snapshot_id},
+        {"$set": {"complete": True, "count": count, "completedAt": datetime.utcnow()}},
+    )
+
+    # Drop everything older than the snapshots we keep, including ones a
+    # crashed worker never finished
+    kept = await db.snapshots.find({"complete": True}).sort("startedAt", -1).to_list(SNAPSHOTS_KEPT)
+    if len(kept) == SNAPSHOTS_KEPT:
+        stale = await db.snapshots.distinct("_id", {"startedAt": {"$lt": kept[-1]["startedAt"]}})
+        if stale:
+            await db.snapshot_items.delete_many({"snapshot": {"$in": stale}})
+            await db.snapshots.delete_many({"_id": {"$in": stale}})
+    return snapshot_id
+
+
+async def snapshot_scheduler():
+    while True:
+        try:
+            snapshot_id = await take_snapshot(int(time.time() // SNAPSHOT_INTERVAL_SECONDS))
+            if snapshot_id:
+                logger.info("Took items snapshot %s", snapshot_id)
+        except Exception:
+            logger.exception("Snapshot failed")
+        # Every worker wakes at the start of the next period; one of them wins
+        await asyncio.sleep(SNAPSHOT_INTERVAL_SECONDS - time.time() % SNAPSHOT_INTERVAL_SECONDS)
+
+
+# Screen bootstrap endpoint
+VIEW_TYPES = {"cart": "cart", "expenses": "expense", "history": None}
+
+@api_router.get("/bootstrap", response_model=Bootstrap)
+async def bootstrap(view: Literal["cart", "expenses", "history"]):
+    """Everything a tab needs on focus: users, its items and their totals"""
+    users, items = await asyncio.gather(load_users(), load_items(VIEW_TYPES[view]))
+    items = [to_item(item) for item in items]
+
+    # Sum in base-currency øre so totals don't pick up float drift; the
+    # conversion runs over the whole amount column at once
+    amounts = get_rates().convert(
+        [to_minor(item.amount) for item in items],
+        [item.currency for item in items],
+        [item.createdAt for item in items],
+    ).tolist()
+    total = expense_total = divided_total = 0
+    paid_by = {}
+    for item, amount in zip(items, amounts):
+        total += amount
+        if item.type == "expense":
+            expense_total += amount
+            if item.isDivided:
+                divided_total += amount
+            if item.paidBy:
+                paid_by[item.paidBy] = paid_by.get(item.paidBy, 0) + amount
+
+    totals = Totals(
+        total=from_minor(total),
+        count=len(items),
+        expenseTotal=from_minor(expense_total),
+        dividedTotal=from_minor(divided_total),
+        paidBy={user_id: from_minor(amount) for user_id, amount in paid_by.items()},
+    )
+    return Bootstrap(users=[User(**user) for user in users], items=items, totals=totals)
+
+
+# Settlement endpoint
+DIVIDED_EXPENSES = {"type": "expense", "isDivided": True, "paidBy": {"$ne": None}}
+
+@api_router.get("/settlement", response_model=Settlement)
+async def get_settlement(mode: Literal["auto", "greedy", "exact"] = "auto"):
+    """Net balance per member and the fewest transfers that settle them"""
+    # Equal splits are summed per payer in the database; only items with
+    # their own weights are shipped back and split one by one. Everything is
+    # converted into the base currency first.
+    rates = get_rates()
+    equal_totals = db.items.aggregate([
+        {"$match": {**DIVIDED_EXPENSES, "splitWeights": None}},
+        {"$group": {"_id": "$paidBy", "amount": {"$sum": rates.amount_expr()}}},
+    ]).to_list(None)
+    weighted = db.items.find(
+        {**DIVIDED_EXPENSES, "splitWeights": {"$ne": None}},
+        {"_id": 0, "amount": 1, "currency": 1, "createdAt": 1, "paidBy": 1, "splitWeights": 1},
+    ).to_list(None)
+    users, equal_totals, weighted = await asyncio.gather(load_users(), equal_totals, weighted)
+
+    paid_by = sum_by_id(equal_totals, "amount")
+    members = [user["id"] for user in users]
+    members += [payer for payer in paid_by if payer not in members]
+    weighted = [decode_item(item) for item in weighted]
+    amounts = rates.convert(
+        [to_minor(item["amount"]) for item in weighted],
+        [item["currency"] for item in weighted],
+        [item["createdAt"] for item in weighted],
+    ).tolist()
+    balances = compute_balances(
+        members,
+        paid_by,
+        (
+            (amount, item["paidBy"], item["splitWeights"])
+            for amount, item in zip(amounts, weighted)
+        ),
+    )
+    owing = sum(1 for amount in balances.values() if amount)
+    if mode == "exact" and owing > EXACT_MAX_MEMBERS:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Exact settlement supports at most {EXACT_MAX_MEMBERS} members with a "
+                   f"balance, {owing} have one; use mode=auto or mode=greedy",
+        )
+    # Solving is CPU-bound and can take a while for big exact groups
+    used, transfers = await asyncio.get_running_loop().run_in_executor(None, settle, balances, mode)
+
+    return Settlement(
+        mode=used,
+        balances={member: from_minor(amount) for member, amount in balances.items()},
+        transfers=[
+            Transfer(fromUser=debtor, toUser=creditor, amount=from_minor(amount))
+            for debtor, creditor, amount in transfers
+        ],
+    )
+
+
+# Offline sync endpoint; items that keep changing under the merge are retried
+# this many times before their mutations are reported as conflicts
+SYNC_MAX_ATTEMPTS = 3
+
+@api_router.post("/sync", response_model=SyncResponse)
+async def sync_items(input: SyncRequest):
+    """Apply a queue of offline mutations, merged per field against the stored items"""
+    client_ids = [m.clientId for m in input.mutations]
+    seen = {
+        doc["_id"]
+        for doc in await db.sync_mutations.find(
+            {"_id": {"$in": client_ids}}, {"_id": 1}
+        ).to_list(None)
+    }
+
+    results = {}
+    pending = []
+    for m in input.mutations:
+        if m.clientId in seen:
+            results[m.clientId] = SyncResult(
+                clientId=m.clientId, itemId=m.itemId, status="duplicate"
+            )
+            continue
+        seen.add(m.clientId)
+
+        data, unset = None, []
+        if m.op == "create":
+            if m.item is None:
+                raise HTTPException(status_code=422, detail=f"Mutation {m.clientId} is missing item")
+            data = encode_fields(Item(**m.item.model_dump(), id=m.itemId).model_dump())
+        elif m.op == "update":
+            if m.changes is None:
+                raise HTTPException(status_code=422, detail=f"Mutation {m.clientId} is missing changes")
+            data, unset = encode_update(m.changes.model_dump(exclude_none=True))
+        pending.append({
+            "clientId": m.clientId,
+            "clientTimestamp": m.clientTimestamp,
+            "op": m.op,
+            "itemId": m.itemId,
+            "data": data,
+            "unset": unset,
+        })
+
+    recorded = list(pending)
+    touched, deleted = [], []
+    for _ in range(SYNC_MAX_ATTEMPTS):
+        item_ids = list({m["itemId"] for m in pending})
+        current = {
+            decode_id(item["id"]): item
+            for item in await db.items.find({"id": ids_query(item_ids)}).to_list(None)
+        }
+        # A create may reuse the id of an item deleted earlier
+        deleted_versions = await last_deletions(
+            [m["itemId"] for m in pending if m["op"] == "create" and m["itemId"] not in current]
+        )
+        merged, writes = merge_mutations(pending, current, deleted_versions)
+        for result in merged:
+            results[result["clientId"]] = SyncResult(**result)
+
+        written, removed, conflicts = await in_transaction(
+            lambda session: apply_sync_writes(writes, current, session)
+        )
+        touched += written
+        deleted += removed
+        # Items someone else wrote since they were read are merged again
+        # against their new state; the rest of the batch stands
+        conflicted = [m for m in pending if m["itemId"] in conflicts]
+        if not conflicted:
+            break
+        pending = conflicted
+    else:
+        for m in conflicted:
+            results[m["clientId"]] = SyncResult(
+                clientId=m["clientId"], itemId=m["itemId"], status="conflict"
+            )
+        # Not recorded, so resending them is not answered as a duplicate
+        recorded = [m for m in recorded if m not in conflicted]
+
+    # Like delete_item, only drop the files once the items are really gone
+    await delete_attachment_files([a for doc in deleted for a in doc.get("attachments", [])])
+    if recorded:
+        now = datetime.utcnow()
+        try:
+            await db.sync_mutations.insert_many(
+                [{"_id": m["clientId"], "createdAt": now} for m in recorded],
+                ordered=False,
+            )
+        except BulkWriteError:
+            pass  # a concurrent replay of the same batch already recorded them
+
+    items = await db.items.find({"id": ids_query(touched)}).sort("createdAt", -1).to_list(None)
+    return SyncResponse(
+        results=[results[m.clientId] for m in input.mutations],
+        items=[to_item(item) for item in items],
+    )
+
+
+async def last_deletions(item_ids: List[str]) -> Dict[str, int]:
+    """Version of the latest logged deletion of each of these items, if any"""
+    if not item_ids:
+        return {}
+    versions = {}
+    for row in await db.item_events.aggregate([
+        {"$match": {"item": ids_query(item_ids), "op": "delete"}},
+        {"$group": {"_id": "$item", "version": {"$max": "$version"}}},
+    ]).to_list(None):
+        # One row per id representation; keep the highest
+        item_id = decode_id(row["_id"])
+        versions[item_id] = max(versions.get(item_id, 0), row["version"])
+    return versions
+
+
+async def apply_sync_writes(writes: List[dict], current: Dict[str, dict], session):
+    """Run merged sync writes; returns written ids, deleted documents and conflicted ids.
+
+    Updates and deletes only match the version they were merged against, so
+    one that finds nothing lost a race with another write to that item.
+    """
+    after = {w["itemId"]: w["doc"] for w in writes if w["op"] == "insert"}
+    if after:
+        await db.items.insert_many(list(after.values()), session=session)
+    removed, conflicts = [], []
+    for w in writes:
+        if w["op"] == "update":
+            doc = await db.items.find_one_and_update(
+                w["filter"], w["update"], return_document=ReturnDocument.AFTER, session=session
+            )
+            if doc:
+                after[w["itemId"]] = doc
+        elif w["op"] == "delete":
+            doc = await db.items.find_one_and_delete(w["filter"], session=session)
+            if doc:
+                removed.append(doc)
+        else:
+            continue
+        if doc is None:
+            conflicts.append(w["itemId"])
+
+    written = [w["itemId"] for w in writes if w["itemId"] not in conflicts]
+    events = diff_events(current, after.values(), written)
+    if events:
+        await db.item_events.insert_many(events, session=session)
+    await track_spending(
+        [(current.get(item_id), after.get(item_id)) for item_id in written], session
+    )
+    return written, removed, conflicts
+
+
+# Retried writes carrying an Idempotency-Key are answered from this collection
+IDEMPOTENCY_TTL_SECONDS = int(os.environ.get('IDEMPOTENCY_TTL_SECONDS', 24 * 60 * 60))
+# A request holding a key for longer than this is presumed dead and a retry may take over
+IDEMPOTENCY_LEASE_SECONDS = float(os.environ.get('IDEMPOTENCY_LEASE_SECONDS', 60))
+
+# Production workers warm up before accepting traffic (see serve.py); a
+# single dev process starts serving straight away and builds indexes behind
+WARM_UP_ON_STARTUP = os.environ.get('WARM_UP_ON_STARTUP', '') == '1'
+MONGO_MIN_POOL_SIZE = int(os.environ.get('MONGO_MIN_POOL_SIZE', 0))
+
+# How often each worker checks for recurring expenses that fell due; 0 disables
+RECURRING_INTERVAL_SECONDS = float(os.environ.get('RECURRING_INTERVAL_SECONDS', 15 * 60))
+
+# How often the items collection is snapshotted for replay; 0 disables
+SNAPSHOT_INTERVAL_SECONDS = float(os.environ.get('SNAPSHOT_INTERVAL_SECONDS', 24 * 60 * 60))
+SNAPSHOTS_KEPT = int(os.environ.get('SNAPSHOTS_KEPT', 3))
+SNAPSHOT_BATCH_SIZE = 1000
 
 # Configure logging
 logging.basicConfig(
@@ -202,6 +1277,99 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-@app.on_event("shutdown")
-async def shutdown_db_client():
+async def create_indexes():
+    await db.items.create_index("id", unique=True)
+    await db.idempotency_keys.create_index(
+        "createdAt", expireAfterSeconds=IDEMPOTENCY_TTL_SECONDS
+    )
+    await db.sync_mutations.create_index(
+        "createdAt", expireAfterSeconds=IDEMPOTENCY_TTL_SECONDS
+    )
+    await db.recurring.create_index("id", unique=True)
+    await db.item_events.create_index("item")
+    await db.snapshots.create_index("period", unique=True)
+    await db.snapshot_items.create_index("snapshot")
+    await db.budgets.create_index("userId", unique=True)
+    await db.budget_totals.create_index("month")
+    await db.budget_alerts.create_index([("month", 1), ("createdAt", -1)])
+
+async def create_indexes_in_background():
+    try:
+        await create_indexes()
+    except Exception:
+        logger.exception("Index creation failed")
+
+async def warm_up():
+    """Open the connection pool and make sure indexes exist"""
+    await asyncio.gather(*(
+        client.admin.command("ping") for _ in range(max(MONGO_MIN_POOL_SIZE, 1))
+    ))
+    await create_indexes()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # The client is created here, inside each worker process, never at import
+    # time: a Motor client must not be shared across a fork.
+    global client, db, transactions_supported
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'], minPoolSize=MONGO_MIN_POOL_SIZE)
+    db = client[os.environ['DB_NAME']]
+
+    background = []
+    if WARM_UP_ON_STARTUP:
+        await warm_up()
+        logger.info("Worker %d warmed up", os.getpid())
+    else:
+        background.append(asyncio.create_task(create_indexes_in_background()))
+
+    schedulers = []
+    if RECURRING_INTERVAL_SECONDS > 0:
+        schedulers.append(asyncio.create_task(recurring_scheduler()))
+    if SNAPSHOT_INTERVAL_SECONDS > 0:
+        schedulers.append(asyncio.create_task(snapshot_scheduler()))
+
+    yield
+
+    # The server has stopped accepting connections and finished in-flight
+    # requests by now; let background work settle before closing the pool.
+    for scheduler in schedulers:
+        scheduler.cancel()
+    await asyncio.gather(*background, *schedulers, return_exceptions=True)
     client.close()
+    client = db = transactions_supported = None
+
+
+def create_app() -> FastAPI:
+    app = FastAPI(lifespan=lifespan)
+
+    # Include the router in the main app
+    app.include_router(api_router)
+
+    app.add_middleware(
+        IdempotencyMiddleware,
+        get_collection=lambda: db.idempotency_keys,
+        lease_seconds=IDEMPOTENCY_LEASE_SECONDS,
+        # Keyed requests are buffered; nothing the API accepts is larger than an attachment
+        max_body_bytes=ATTACHMENT_MAX_BYTES,
+    )
+
+    # Shed load with a fast 503 instead of queueing unbounded database work.
+    # Health and metrics stay reachable while overloaded.
+    app.add_middleware(
+        AdmissionMiddleware,
+        controller=admission,
+        exempt={"/api/", "/api/metrics/admission"},
+        routed=[(ATTACHMENT_TRANSFERS, attachment_admission)],
+    )
+
+    app.add_middleware(
+        CORSMiddleware,
+        allow_credentials=True,
+        allow_origins=["*"],
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+    return app
+
+
+app = create_app()
@@ -0,0 +1,147 @@
+"""
+Who owes whom: turn shared expenses into a minimal list of transfers.
+
+All amounts are integers in minor units (øre), so balances always sum to
+exactly zero and no transfer is ever off by a rounding error.
+"""
+
+import heapq
+from typing import Dict, Iterable, List, Mapping, Tuple
+
+# Exact minimisation is exponential in the number of members with a
+# non-zero balance; above this many we fall back to the greedy solver
+EXACT_MAX_MEMBERS = 14
+
+
+def allocate(amount: int, weights: Mapping[str, float]) -> Dict[str, int]:
+    """Split ``amount`` by ``weights`` so the integer shares add up exactly.
+
+    Uses the largest-remainder method: everyone gets the floor of their
+    share and the leftover units go to the largest fractional parts.
+    """
+    weights = {k: w for k, w in weights.items() if w > 0}
+    total = sum(weights.values())
+    if not weights or total <= 0:
+        return {}
+    exact = {k: amount * w / total for k, w in weights.items()}
+    shares = {k: int(v // 1) for k, v in exact.items()}
+    leftover = amount - sum(shares.values())
+    for k in sorted(exact, key=lambda k: (shares[k] - exact[k], k))[:leftover]:
+        shares[k] += 1
+    return shares
+
+
+def compute_balances(
+    members: Iterable[str],
+    paid_by_total: Mapping[str, int],
+    weighted: Iterable[Tuple[int, str, Mapping[str, float]]] = (),
+) -> Dict[str, int]:
+    """Net balance per member; positive means the member is owed money.
+
+    ``paid_by_total`` holds, per payer, the sum of divided expenses split
+    equally between all members. ``weighted`` yields (amount, payer, weights)
+    for expenses with their own split.
+    """
+    members = list(members)
+    balances = {m: 0 for m in members}
+
+    equal_total = 0
+    for payer, amount in paid_by_total.items():
+        balances[payer] = balances.get(payer, 0) + amount
+        equal_total += amount
+    if members:
+        for member, share in allocate(equal_total, {m: 1 for m in members}).items():
+            balances[member] -= share
+
+    for amount, payer, weights in weighted:
+        balances[payer] = balances.get(payer, 0) + amount
+        # Weights that are all zero fall back to an equal split
+        shares = allocate(amount, weights) or allocate(amount, {m: 1 for m in members})
+        for member, share in shares.items():
+            balances[member] = balances.get(member, 0) - share
+
+    return balances
+
+
+def settle_greedy(balances: Mapping[str, int]) -> List[Tuple[str, str, int]]:
+    """Repeatedly settle the largest debtor against the largest creditor.
+
+    O(n log n), at most n - 1 transfers; usually optimal or within a
+    transfer or two of it.
+    """
+    creditors = [(-amount, member) for member, amount in balances.items() if amount > 0]
+    debtors = [(amount, member) for member, amount in balances.items() if amount < 0]
+    heapq.heapify(creditors)
+    heapq.heapify(debtors)
+
+    transfers = []
+    while creditors and debtors:
+        credit, creditor = heapq.heappop(creditors)
+        debt, debtor = heapq.heappop(debtors)
+        amount = min(-credit, -debt)
+        transfers.append((debtor, creditor, amount))
+        if -credit > amount:
+            heapq.heappush(creditors, (credit + amount, creditor))
+        if -debt > amount:
+            heapq.heappush(debtors, (debt + amount, debtor))
+    return transfers
+
+
+def settle_exact(balances: Mapping[str, int]) -> List[Tuple[str, str, int]]:
+    """Minimum number of transfers.
+
+    n members with non-zero balances need n - k transfers, where k is the
+    largest number of disjoint groups that each sum to zero. The best
+    partition is found by dynamic programming over subsets, then each group
+    is settled on its own (a zero-sum group of size s needs s - 1 transfers,
+    which the greedy solver achieves).
+    """
+    members = [m for m, amount in balances.items() if amount != 0]
+    n = len(members)
+    if n > EXACT_MAX_MEMBERS:
+        raise ValueError(f"exact settlement supports at most {EXACT_MAX_MEMBERS} members")
+    amounts = [balances[m] for m in members]
+
+    full = (1 << n) - 1
+    sums = [0] * (full + 1)
+    for mask in range(1, full + 1):
+        low = mask & -mask
+        sums[mask] = sums[mask ^ low] + amounts[low.bit_length() - 1]
+
+    # groups[mask]: most zero-sum groups the members in mask can be split into
+    groups = [0] * (full + 1)
+    came_from = [0] * (full + 1)
+    for mask in range(1, full + 1):
+        best, best_prev = -1, 0
+        rest = mask
+        while rest:
+            bit = rest & -rest
+            rest ^= bit
+            if groups[mask ^ bit] > best:
+                best, best_prev = groups[mask ^ bit], mask ^ bit
+        groups[mask] = best + (sums[mask] == 0)
+        came_from[mask] = best_prev
+
+    # Walk back; every zero-sum prefix on the path closes a group
+    transfers = []
+    mask, boundary = full, full
+    while mask:
+        prev = came_from[mask]
+        if sums[prev] == 0:
+            group = boundary ^ prev
+            transfers += settle_greedy(
+                {members[i]: amounts[i] for i in range(n) if group >> i & 1}
+            )
+            boundary = prev
+        mask = prev
+    return transfers
+
+
+def settle(balances: Mapping[str, int], mode: str = "auto") -> Tuple[str, List[Tuple[str, str, int]]]:
+    """Pick a solver; returns the mode actually used and the transfers"""
+    if mode == "auto":
+        nonzero = sum(1 for amount in balances.values() if amount != 0)
+        mode = "exact" if nonzero <= EXACT_MAX_MEMBERS else "greedy"
+    if mode == "exact":
+        return mode, settle_exact(balances)
+    return "greedy", settle_greedy(balances)
@@ -0,0 +1,44 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    """Share one in-flight call between concurrent callers with the same key.
+
+    The first caller for a key starts the call; everyone arriving while it is
+    still running awaits the same task and receives the same result (or
+    exception). Nothing is cached once the call completes, so later requests
+    always hit the database again.
+
+    Writers call ``invalidate()`` once their write has committed. Calls
+    started before that are no longer joined, so a read issued after a
+    write never gets a result that was loaded before it.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+        self.generation = 0
+
+    def invalidate(self):
+        self.generation += 1
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        key = (self.generation, key)
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda t: self._forget(key, t))
+        # Shield the shared task so one client disconnecting does not cancel
+        # the query for every other caller waiting on it.
+        return await asyncio.shield(task)
+
+    def _forget(self, key: Hashable, task: asyncio.Task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            # Mark the exception as retrieved when nobody is left to await it.
+            task.exception()
+
+    def __len__(self):
+        return len(self._calls)
@@ -0,0 +1,115 @@
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from codec import id_query, version_filter
+
+# Fields an offline client may change; each carries its own last-writer timestamp
+SYNC_FIELDS = ("name", "amount", "currency", "type", "paidBy", "isDivided", "splitWeights")
+
+
+def utc_naive(dt: datetime) -> datetime:
+    """Normalize to the naive-UTC datetimes MongoDB hands back."""
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt
+
+
+def merge_mutations(
+    mutations: List[dict],
+    current: Dict[str, dict],
+    deleted_versions: Optional[Dict[str, int]] = None,
+) -> Tuple[List[dict], List[dict]]:
+    """Resolve a batch of queued client mutations against the stored items.
+
+    ``mutations`` are dicts with ``clientId``, ``clientTimestamp``, ``op``,
+    ``itemId``, ``data`` (already in stored form) and, for updates, ``unset``
+    (fields to remove, as ``codec.encode_update`` returns them); ``current`` maps item
+    ids to their stored documents. Mutations are applied in client timestamp order and every
+    field keeps the value with the newest timestamp (last writer wins per
+    field). Returns the per-mutation results and one write per touched item
+    that brings the database to the merged state: ``{"itemId", "op":
+    "insert", "doc"}``, ``{"itemId", "op": "update", "filter", "update"}`` or
+    ``{"itemId", "op": "delete", "filter"}``. Update and delete filters match
+    only the version merged against, so a write that landed since
+    ``current`` was read makes them match nothing.
+
+    ``deleted_versions`` maps ids of deleted items to the version their
+    deletion was logged with. Re-creating one of them continues from there,
+    so the item's events stay in version order.
+    """
+    deleted_versions = deleted_versions or {}
+    states: Dict[str, Optional[dict]] = {k: dict(v) for k, v in current.items()}
+    results = []
+
+    for m in sorted(mutations, key=lambda m: utc_naive(m["clientTimestamp"])):
+        item_id = m["itemId"]
+        ts = utc_naive(m["clientTimestamp"])
+        state = states.get(item_id)
+        data = m.get("data") or {}
+        unset = m.get("unset") or ()
+        status = "applied"
+
+        if m["op"] == "create":
+            if state is not None:
+                status = "duplicate"
+            else:
+                doc = {"id": item_id, **data, "createdAt": ts}
+                if item_id in deleted_versions:
+                    doc["version"] = deleted_versions[item_id] + 1
+                doc["fieldTimestamps"] = {f: ts for f in SYNC_FIELDS if f in doc}
+                states[item_id] = doc
+        elif m["op"] == "update":
+            if state is None:
+                status = "not_found"
+            else:
+                stamps = state.setdefault("fieldTimestamps", {})
+                changed = False
+                for field in SYNC_FIELDS:
+                    if data.get(field) is None and field not in unset:
+                        continue
+                    if ts > stamps.get(field, datetime.min):
+                        if field in unset:
+                            state.pop(field, None)
+                        else:
+                            state[field] = data[field]
+                        stamps[field] = ts
+                        changed = True
+                if not changed:
+                    status = "stale"
+        elif m["op"] == "delete":
+            if state is None:
+                status = "not_found"
+            else:
+                states[item_id] = None
+
+        results.append({"clientId": m["clientId"], "itemId": item_id, "status": status})
+
+    writes = []
+    for item_id, state in states.items():
+        before = current.get(item_id)
+        if before is None and state is None:
+            continue
+        if before is None:
+            writes.append({"itemId": item_id, "op": "insert", "doc": state})
+            continue
+        query = {"id": id_query(item_id), "version": version_filter(before.get("version") or 0)}
+        if state is None:
+            writes.append({"itemId": item_id, "op": "delete", "filter": query})
+            continue
+        update, removed = {}, {}
+        for field in SYNC_FIELDS:
+            if field in state and state.get(field) != before.get(field):
+                update[field] = state[field]
+            elif field in before and field not in state:
+                removed[field] = ""
+            else:
+                continue
+            update[f"fieldTimestamps.{field}"] = state["fieldTimestamps"][field]
+        if not update:
+            continue
+        operation = {"$set": update, "$inc": {"version": 1}}
+        if removed:
+            operation["$unset"] = removed
+        writes.append({"itemId": item_id, "op": "update", "filter": query, "update": operation})
+
+    return results, writes
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Legacy vs compact item schema: document size, index size and aggregation time.
+
+Builds the same synthetic ledger in both representations. Document sizes are
+measured offline with BSON encoding. When MONGO_URL is set, both variants are
+also loaded into a scratch database (dropped afterwards) to compare
+collection/index sizes from collStats and the time of a per-payer sum.
+
+Usage:
+    python benchmarks/compact_schema.py [--items 100000] [--runs 5]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import bson
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+from codec import encode_fields  # noqa: E402
+
+SCRATCH_DB = "compact_schema_benchmark"
+INDEXES = [[("id", 1)], [("type", 1), ("createdAt", -1)], [("paidBy", 1)]]
+
+
+def legacy_items(n, members=2, seed=1):
+    rng = random.Random(seed)
+    users = [str(uuid.UUID(int=rng.getrandbits(128), version=4)) for _ in range(members)]
+    start = datetime(2024, 1, 1)
+    for i in range(n):
+        payer = rng.choice(users)
+        expense = rng.random() < 0.8
+        yield {
+            "id": str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+            "name": rng.choice(["Groceries", "Rent", "Coffee", "Train ticket", "Pharmacy"]),
+            "amount": round(rng.uniform(5, 2500), 2),
+            "currency": "DKK",
+            "type": "expense" if expense else "cart",
+            "paidBy": payer if expense else None,
+            "isDivided": rng.random() < 0.5,
+            "createdAt": start + timedelta(minutes=i),
+            "createdBy": rng.choice(users),
+            "version": 0,
+        }
+
+
+def sizes(docs):
+    return [len(bson.encode(doc)) for doc in docs]
+
+
+def time_aggregation(collection, pipeline, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        list(collection.aggregate(pipeline))
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--items", type=int, default=100_000)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    legacy = list(legacy_items(args.items))
+    compact = [encode_fields(doc) for doc in legacy]
+
+    legacy_sizes, compact_sizes = sizes(legacy), sizes(compact)
+    print(f"{args.items} items")
+    print(f"  avg document size   legacy {statistics.mean(legacy_sizes):7.1f} B"
+          f"   compact {statistics.mean(compact_sizes):7.1f} B"
+          f"   ({1 - sum(compact_sizes) / sum(legacy_sizes):.0%} smaller)")
+
+    float_total = sum(doc["amount"] for doc in legacy if doc["type"] == "expense")
+    minor_total = sum(doc["amount"] for doc in compact if doc["type"] == "expense")
+    print(f"  expense total       float  {float_total!r}   int64 øre {minor_total / 100:.2f}")
+
+    mongo_url = os.environ.get("MONGO_URL")
+    if not mongo_url:
+        print("MONGO_URL not set; skipping collection, index and aggregation measurements")
+        return
+
+    from pymongo import MongoClient
+
+    client = MongoClient(mongo_url)
+    db = client[SCRATCH_DB]
+    try:
+        results = {}
+        for name, docs in (("legacy", legacy), ("compact", compact)):
+            collection = db[name]
+            collection.drop()
+            for start in range(0, len(docs), 10_000):
+                collection.insert_many([dict(doc) for doc in docs[start:start + 10_000]])
+            for keys in INDEXES:
+                collection.create_index(keys)
+            stats = db.command("collStats", name)
+            pipeline = [
+                {"$match": {"type": "expense"}},
+                {"$group": {"_id": "$paidBy", "total": {"$sum": "$amount"}}},
+            ]
+            results[name] = (stats, time_aggregation(collection, pipeline, args.runs))
+
+        for name, (stats, seconds) in results.items():
+            print(f"  {name:8} data {stats['size'] / 1e6:7.2f} MB"
+                  f"   indexes {stats['totalIndexSize'] / 1e6:7.2f} MB"
+                  f"   per-payer sum {seconds * 1000:7.1f} ms")
+            for index, size in stats["indexSizes"].items():
+                print(f"             {index:24} {size / 1e6:7.2f} MB")
+    finally:
+        client.drop_database(SCRATCH_DB)
+        client.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Import-time / cold-start benchmark for the API entry points.
+
+Runs every entry point in a fresh interpreter under ``python -X importtime``
+and reports the wall time of the import plus the most expensive top-level
+modules it pulled in. Nothing connects to MongoDB: a cold start is the cost
+paid before the first request can be served.
+
+Usage:
+    python benchmarks/importtime.py [--runs 7] [--top 8] [--markdown]
+"""
+
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# name -> (working directory, python snippet that imports the entry point)
+ENTRY_POINTS = {
+    "backend/server.py": (ROOT / "backend", "import server"),
+}
+for path in sorted((ROOT / "vercel-app" / "api").rglob("*.py")):
+    rel = path.relative_to(ROOT / "vercel-app")
+    if any(part.startswith("_") for part in rel.parts):
+        continue
+    ENTRY_POINTS[f"vercel-app/{rel}"] = (
+        ROOT / "vercel-app",
+        "import importlib.util as u; "
+        f"s = u.spec_from_file_location('handler_module', {str(rel)!r}); "
+        "s.loader.exec_module(u.module_from_spec(s))",
+    )
+
+# Entry points imported by name; their direct children are what they cost us
+WRAPPERS = {"server"}
+
+ENV = {
+    **os.environ,
+    # Unroutable address: the benchmark must never reach a real database
+    "MONGO_URL": "mongodb://127.0.0.1:1/?serverSelectionTimeoutMS=1",
+    "DB_NAME": "importtime_benchmark",
+}
+
+LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s+)(\S+)")
+
+
+def profile(cwd, code, startup=frozenset()):
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=cwd, env=ENV, capture_output=True, text=True,
+    )
+    wall = time.perf_counter() - start
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1])
+
+    top_level = {}
+    parent = None
+    for line in reversed(proc.stderr.splitlines()):
+        # importtime prints children before their parent, so walk backwards
+        match = LINE.match(line)
+        if not match:
+            continue
+        _, cumulative, indent, module = match.groups()
+        depth = (len(indent) - 1) // 2
+        if depth == 0:
+            parent = module
+        if module in startup or parent in startup:
+            continue
+        if (depth == 0 and module not in WRAPPERS) or (depth == 1 and parent in WRAPPERS):
+            top_level[module] = top_level.get(module, 0) + int(cumulative)
+    return wall, top_level
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--runs", type=int, default=7)
+    parser.add_argument("--top", type=int, default=8)
+    parser.add_argument("--markdown", action="store_true", help="print a markdown table")
+    args = parser.parse_args()
+
+    # Interpreter startup (site, encodings, ...) is paid by every entry point
+    # alike, so it is measured once and left out of the per-module breakdown
+    baseline_wall, baseline = profile(ROOT, "pass")
+    startup = frozenset(baseline)
+
+    rows = []
+    for name, (cwd, code) in ENTRY_POINTS.items():
+        walls = []
+        for _ in range(args.runs):
+            wall, modules = profile(cwd, code, startup)
+            walls.append(wall)
+        total_us = sum(modules.values())
+        heaviest = sorted(modules.items(), key=lambda kv: kv[1], reverse=True)[: args.top]
+        rows.append((name, statistics.median(walls), total_us, heaviest))
+
+    print(f"interpreter startup: {baseline_wall * 1000:.0f} ms (included in cold start)\n")
+    if args.markdown:
+        print("| Entry point | Cold start (median wall, ms) | Import time (ms) | Heaviest imports (ms) |")
+        print("|---|---:|---:|---|")
+        for name, wall, total_us, heaviest in rows:
+            top = ", ".join(f"{m} {us / 1000:.1f}" for m, us in heaviest[:4])
+            print(f"| {name} | {wall * 1000:.0f} | {total_us / 1000:.1f} | {top} |")
+        return
+
+    for name, wall, total_us, heaviest in rows:
+        print(f"{name}")
+        print(f"  cold start (median wall): {wall * 1000:8.1f} ms")
+        print(f"  import time (cumulative): {total_us / 1000:8.1f} ms")
+        for module, us in heaviest:
+            print(f"    {us / 1000:8.1f} ms  {module}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Settlement solver time against a budget, for large households and ledgers.
+
+Generates a synthetic ledger (a share of it with uneven split weights),
+computes balances the way GET /api/settlement does once the per-payer sums
+of equally split items come back from the database, and solves it with the
+greedy solver. The exact solver is timed separately on the largest group it
+accepts, with balances drawn so that many zero-sum subgroups exist. Exits
+non-zero when any step exceeds --budget-ms.
+
+Usage:
+    python benchmarks/settlement.py [--members 60] [--expenses 200000]
+        [--weighted 0.3] [--budget-ms 1000] [--runs 5]
+"""
+
+import argparse
+import random
+import statistics
+import sys
+import time
+import uuid
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+from settlement import EXACT_MAX_MEMBERS, compute_balances, settle_exact, settle_greedy  # noqa: E402
+
+
+def ledger(members, expenses, weighted_share, seed=1):
+    rng = random.Random(seed)
+    users = [str(uuid.UUID(int=rng.getrandbits(128), version=4)) for _ in range(members)]
+    paid_by = {}
+    weighted = []
+    for _ in range(expenses):
+        payer = rng.choice(users)
+        amount = rng.randint(500, 250_000)  # øre
+        if rng.random() < weighted_share:
+            split = rng.sample(users, rng.randint(2, min(6, members)))
+            weighted.append((amount, payer, {u: rng.choice((1, 1, 2, 3)) for u in split}))
+        else:
+            paid_by[payer] = paid_by.get(payer, 0) + amount
+    return users, paid_by, weighted
+
+
+def clustered_balances(members, seed=1):
+    """Balances made of small zero-sum groups, where greedy is most often beaten"""
+    rng = random.Random(seed)
+    balances = {}
+    while len(balances) < members:
+        # One debtor owing two or three creditors; a group of one can't occur
+        size = min(rng.choice((3, 4)), members - len(balances))
+        if members - len(balances) - size == 1:
+            size -= 1
+        credits = [rng.randint(100, 10_000) for _ in range(size - 1)]
+        for amount in credits + [-sum(credits)]:
+            balances[f"m{len(balances)}"] = amount
+    return balances
+
+
+def timed(fn, runs):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return result, statistics.median(times) * 1000, max(times) * 1000
+
+
+def check(balances, transfers):
+    remaining = dict(balances)
+    for debtor, creditor, amount in transfers:
+        assert amount > 0
+        remaining[debtor] += amount
+        remaining[creditor] -= amount
+    assert not any(remaining.values()), "transfers do not settle every balance"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--members", type=int, default=60)
+    parser.add_argument("--expenses", type=int, default=200_000)
+    parser.add_argument("--weighted", type=float, default=0.3)
+    parser.add_argument("--budget-ms", type=float, default=1000)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    users, paid_by, weighted = ledger(args.members, args.expenses, args.weighted)
+    balances, balance_ms, balance_max = timed(
+        lambda: compute_balances(users, paid_by, weighted), args.runs
+    )
+    assert sum(balances.values()) == 0, "balances do not sum to zero"
+    transfers, greedy_ms, greedy_max = timed(lambda: settle_greedy(balances), args.runs)
+    check(balances, transfers)
+
+    small = clustered_balances(EXACT_MAX_MEMBERS)
+    exact, exact_ms, exact_max = timed(lambda: settle_exact(small), args.runs)
+    check(small, exact)
+    greedy_small = settle_greedy(small)
+
+    print(f"{args.members} members, {args.expenses} expenses ({len(weighted)} with split weights)")
+    print(f"{'step':<28} {'median ms':>10} {'max ms':>8}")
+    rows = [
+        ("balances", balance_ms, balance_max),
+        (f"greedy ({len(transfers)} transfers)", greedy_ms, greedy_max),
+        (f"exact, {EXACT_MAX_MEMBERS} members", exact_ms, exact_max),
+    ]
+    for name, median, worst in rows:
+        print(f"{name:<28} {median:>10.1f} {worst:>8.1f}")
+    print(f"exact: {len(exact)} transfers, greedy on the same group: {len(greedy_small)}")
+
+    total = balance_max + greedy_max
+    print(f"worst case end to end (balances + greedy): {total:.1f} ms, budget {args.budget_ms:.0f} ms")
+    if total > args.budget_ms or exact_max > args.budget_ms:
+        sys.exit("over budget")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Throughput scaling of backend/serve.py across worker processes.
+
+For each worker count, starts the production entry point on a free port,
+waits until it answers, drives it with a fixed number of concurrent
+keep-alive clients for a fixed duration and reports requests/second and
+latency percentiles. Needs MONGO_URL/DB_NAME pointing at a database the
+workers can reach (the default path reads items) and httpx installed.
+
+Usage:
+    python benchmarks/worker_scaling.py [--workers 1,2,4] [--concurrency 64]
+        [--duration 15] [--path "/api/bootstrap?view=expenses"] [--server-cpus 0-3]
+
+The numbers only mean something on a host with more cores than the largest
+worker count, against a seeded database (a few thousand items) that runs on
+its own machine or cores. Keep the workers and the load generator on
+separate cores, e.g. on an 8-core host:
+
+    MONGO_URL=mongodb://db-host:27017 DB_NAME=bench \\
+        taskset -c 4-7 python benchmarks/worker_scaling.py \\
+        --workers 1,2,4 --server-cpus 0-3
+
+Expect req/s to grow close to linearly with workers until the database or
+the client saturates. Record the host, core split and database size next
+to any results; runs on a single shared core only measure context
+switching.
+"""
+
+import argparse
+import asyncio
+import os
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+SERVE = Path(__file__).resolve().parent.parent / "backend" / "serve.py"
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def wait_ready(base_url, timeout=60):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get(f"{base_url}/api/")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError("server did not become ready")
+
+
+async def drive(url, concurrency, duration):
+    latencies = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(limits=limits, timeout=30) as client:
+        async def user():
+            nonlocal errors
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                try:
+                    response = await client.get(url)
+                    ok = response.status_code == 200
+                except httpx.HTTPError:
+                    ok = False
+                if ok:
+                    latencies.append(time.perf_counter() - start)
+                else:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(user() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    return latencies, errors, elapsed
+
+
+def percentile(values, pct):
+    if not values:
+        return float("nan")
+    return statistics.quantiles(values, n=100)[pct - 1] if len(values) > 1 else values[0]
+
+
+async def run(workers, args):
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    command = [sys.executable, str(SERVE), "--workers", str(workers), "--host", "127.0.0.1", "--port", str(port)]
+    if args.server_cpus:
+        command = ["taskset", "-c", args.server_cpus, *command]
+    server = subprocess.Popen(
+        command,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        await wait_ready(base_url)
+        # Let every worker finish warming up and take a few requests first
+        await drive(base_url + args.path, args.concurrency, 2)
+        latencies, errors, elapsed = await drive(base_url + args.path, args.concurrency, args.duration)
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=60)
+    return len(latencies) / elapsed, percentile(latencies, 50), percentile(latencies, 99), errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--workers", default="1,2,4")
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--duration", type=float, default=15)
+    parser.add_argument("--path", default="/api/bootstrap?view=expenses")
+    parser.add_argument("--server-cpus", help="taskset CPU list for the workers, e.g. 0-3")
+    args = parser.parse_args()
+
+    if "MONGO_URL" not in os.environ:
+        sys.exit("MONGO_URL must be set (workers connect to MongoDB on startup)")
+
+    pinned = f", workers on CPUs {args.server_cpus}" if args.server_cpus else ""
+    print(f"{os.cpu_count()} CPUs{pinned}, {args.concurrency} concurrent clients, GET {args.path}")
+    print(f"{'workers':>7} {'req/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7} {'speedup':>8}")
+    baseline = None
+    for workers in (int(w) for w in args.workers.split(",")):
+        rps, p50, p99, errors = asyncio.run(run(workers, args))
+        baseline = baseline or rps
+        print(f"{workers:>7} {rps:>9.0f} {p50 * 1000:>8.1f} {p99 * 1000:>8.1f} {errors:>7} {rps / baseline:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
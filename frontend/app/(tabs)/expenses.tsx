@@ -37,8 +37,16 @@ interface User {
   name: string;
 }
 
+interface Totals {
+  currency: string;
+  total: number;
+  expenseTotal: number;
+}
+
 export default function ExpensesScreen() {
   const [items, setItems] = useState<Item[]>([]);
+  // Computed by the server, converted into the base currency
+  const [totals, setTotals] = useState<Totals | null>(null);
   const [users, setUsers] = useState<User[]>([]);
   const [currentUser, setCurrentUser] = useState<User | null>(null);
   const [loading, setLoading] = useState(true);
@@ -64,15 +72,12 @@ export default function ExpensesScreen() {
         setSelectedPayer(userId);
       }
 
-      // Load users
-      const usersRes = await fetch(`${BACKEND_URL}/api/users`);
-      const usersData = await usersRes.json();
-      setUsers(usersData);
-
-      // Load expense items
-      const itemsRes = await fetch(`${BACKEND_URL}/api/items?type=expense`);
-      const itemsData = await itemsRes.json();
-      setItems(itemsData);
+      // Users and expense items in one round trip
+      const res = await fetch(`${BACKEND_URL}/api/bootstrap?view=expenses`);
+      const data = await res.json();
+      setUsers(data.users);
+      setItems(data.items);
+      setTotals(data.totals);
     } catch (error) {
       console.error('Error loading data:', error);
     } finally {
@@ -210,7 +215,7 @@ export default function ExpensesScreen() {
     );
   }
 
-  const totalAmount = items.reduce((sum, item) => sum + item.amount, 0);
+  const totalAmount = totals?.total ?? 0;
   const dividedItems = items.filter((item) => item.isDivided);
   const pendingItems = items.filter((item) => !item.isDivided);
 
@@ -224,7 +229,7 @@ export default function ExpensesScreen() {
       <View style={styles.summaryRow}>
         <View style={[styles.summaryCard, { flex: 1 }]}>
           <Text style={styles.summaryLabel}>Total</Text>
-          <Text style={styles.summaryAmount}>{totalAmount.toFixed(2)} DKK</Text>
+          <Text style={styles.summaryAmount}>{totalAmount.toFixed(2)} {totals?.currency ?? 'DKK'}</Text>
         </View>
         <View style={[styles.summaryCard, { flex: 1 }]}>
           <Text style={styles.summaryLabel}>Divided</Text>
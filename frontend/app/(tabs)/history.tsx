@@ -30,8 +30,16 @@ interface User {
   name: string;
 }
 
+interface Totals {
+  currency: string;
+  total: number;
+  expenseTotal: number;
+}
+
 export default function HistoryScreen() {
   const [items, setItems] = useState<Item[]>([]);
+  // Computed by the server, converted into the base currency
+  const [totals, setTotals] = useState<Totals | null>(null);
   const [users, setUsers] = useState<User[]>([]);
   const [loading, setLoading] = useState(true);
   const [refreshing, setRefreshing] = useState(false);
@@ -44,15 +52,12 @@ export default function HistoryScreen() {
 
   const loadData = async () => {
     try {
-      // Load users
-      const usersRes = await fetch(`${BACKEND_URL}/api/users`);
-      const usersData = await usersRes.json();
-      setUsers(usersData);
-
-      // Load ALL items
-      const itemsRes = await fetch(`${BACKEND_URL}/api/items`);
-      const itemsData = await itemsRes.json();
-      setItems(itemsData);
+      // Users and ALL items in one round trip
+      const res = await fetch(`${BACKEND_URL}/api/bootstrap?view=history`);
+      const data = await res.json();
+      setUsers(data.users);
+      setItems(data.items);
+      setTotals(data.totals);
     } catch (error) {
       console.error('Error loading data:', error);
     } finally {
@@ -145,7 +150,7 @@ export default function HistoryScreen() {
   const cartItems = items.filter((i) => i.type === 'cart');
   const expenseItems = items.filter((i) => i.type === 'expense');
   const dividedExpenses = expenseItems.filter((i) => i.isDivided);
-  const totalExpenses = expenseItems.reduce((sum, i) => sum + i.amount, 0);
+  const totalExpenses = totals?.expenseTotal ?? 0;
 
   return (
     <SafeAreaView style={styles.container} edges={['top']}>
@@ -174,7 +179,7 @@ export default function HistoryScreen() {
 
       <View style={styles.totalCard}>
         <Text style={styles.totalLabel}>Total Expenses</Text>
-        <Text style={styles.totalAmount}>{totalExpenses.toFixed(2)} DKK</Text>
+        <Text style={styles.totalAmount}>{totalExpenses.toFixed(2)} {totals?.currency ?? 'DKK'}</Text>
       </View>
 
       <FlatList
@@ -0,0 +1,141 @@
+import asyncio
+
+from admission import (
+    PRIORITY_LISTING, PRIORITY_READ, PRIORITY_WRITE, AdmissionController, AdmissionMiddleware,
+    route_priority,
+)
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+async def settle():
+    # Let queued acquire() calls reach their wait
+    for _ in range(3):
+        await asyncio.sleep(0)
+
+
+def test_route_priority():
+    assert route_priority("POST", "/api/items", b"") == PRIORITY_WRITE
+    assert route_priority("GET", "/api/items", b"type=cart") == PRIORITY_READ
+    assert route_priority("GET", "/api/items", b"") == PRIORITY_LISTING
+    assert route_priority("GET", "/api/bootstrap", b"view=history") == PRIORITY_LISTING
+
+
+def test_admits_up_to_limit_then_hands_slot_over():
+    async def scenario():
+        controller = AdmissionController(limit=1, max_queue=2, queue_timeout=1)
+        assert await controller.acquire(PRIORITY_READ)
+        waiter = asyncio.ensure_future(controller.acquire(PRIORITY_READ))
+        await settle()
+        assert controller.snapshot()["queueDepth"] == 1
+        controller.release()
+        assert await waiter
+        # The slot moved to the waiter instead of being freed
+        assert controller.in_flight == 1
+        controller.release()
+        assert controller.in_flight == 0
+
+    run(scenario())
+
+
+def test_higher_priority_is_served_first():
+    async def scenario():
+        controller = AdmissionController(limit=1, max_queue=2, queue_timeout=1)
+        await controller.acquire(PRIORITY_READ)
+        listing = asyncio.ensure_future(controller.acquire(PRIORITY_LISTING))
+        await settle()
+        write = asyncio.ensure_future(controller.acquire(PRIORITY_WRITE))
+        await settle()
+        controller.release()
+        assert await write
+        assert not listing.done()
+        controller.release()
+        assert await listing
+
+    run(scenario())
+
+
+def test_full_queue_rejects_newcomer():
+    async def scenario():
+        controller = AdmissionController(limit=1, max_queue=1, queue_timeout=1)
+        await controller.acquire(PRIORITY_WRITE)
+        queued = asyncio.ensure_future(controller.acquire(PRIORITY_READ))
+        await settle()
+        assert not await controller.acquire(PRIORITY_READ)
+        assert controller.shed["queue_full"] == 1
+        controller.release()
+        assert await queued
+
+    run(scenario())
+
+
+def test_full_queue_displaces_lower_priority():
+    async def scenario():
+        controller = AdmissionController(limit=1, max_queue=1, queue_timeout=1)
+        await controller.acquire(PRIORITY_WRITE)
+        listing = asyncio.ensure_future(controller.acquire(PRIORITY_LISTING))
+        await settle()
+        write = asyncio.ensure_future(controller.acquire(PRIORITY_WRITE))
+        await settle()
+        assert await listing is False
+        assert controller.shed["displaced"] == 1
+        controller.release()
+        assert await write
+
+    run(scenario())
+
+
+def test_queue_timeout_sheds():
+    async def scenario():
+        controller = AdmissionController(limit=1, max_queue=1, queue_timeout=0.01)
+        await controller.acquire(PRIORITY_WRITE)
+        assert not await controller.acquire(PRIORITY_READ)
+        assert controller.shed["timeout"] == 1
+        assert controller.snapshot()["queueDepth"] == 0
+        controller.release()
+        assert controller.in_flight == 0
+
+    run(scenario())
+
+
+def test_routed_requests_use_their_own_controller():
+    async def scenario():
+        default = AdmissionController(limit=1, max_queue=0, queue_timeout=1)
+        transfers = AdmissionController(limit=1, max_queue=0, queue_timeout=1)
+        held = asyncio.Event()
+        done = asyncio.Event()
+
+        async def app(scope, receive, send):
+            if scope["path"].endswith("/attachments"):
+                held.set()
+                await done.wait()
+            await send({"type": "http.response.start", "status": 200, "headers": []})
+            await send({"type": "http.response.body", "body": b""})
+
+        middleware = AdmissionMiddleware(
+            app, default, routed=[(r"^POST /api/items/[^/]+/attachments$", transfers)],
+        )
+        sent = []
+
+        async def send(message):
+            sent.append(message)
+
+        def call(method, path):
+            scope = {"type": "http", "method": method, "path": path, "query_string": b""}
+            return middleware(scope, None, send)
+
+        upload = asyncio.ensure_future(call("POST", "/api/items/1/attachments"))
+        await held.wait()
+        assert transfers.in_flight == 1 and default.in_flight == 0
+        # A held upload neither blocks ordinary requests nor admits a second upload
+        await call("GET", "/api/items")
+        await call("POST", "/api/items/2/attachments")
+        statuses = [m["status"] for m in sent if m["type"] == "http.response.start"]
+        assert statuses == [200, 503]
+        done.set()
+        await upload
+        assert transfers.in_flight == 0
+
+    run(scenario())
@@ -0,0 +1,42 @@
+import pytest
+
+from attachments import RangeNotSatisfiable, parse_range
+
+
+def test_explicit_and_open_ended_ranges():
+    assert parse_range("bytes=0-99", 1000) == (0, 99)
+    assert parse_range("bytes=500-", 1000) == (500, 999)
+    # An end past the file is clamped to its last byte
+    assert parse_range("bytes=900-5000", 1000) == (900, 999)
+    assert parse_range("bytes=3-3", 1000) == (3, 3)
+
+
+def test_suffix_ranges():
+    assert parse_range("bytes=-100", 1000) == (900, 999)
+    assert parse_range("bytes=-5000", 1000) == (0, 999)
+    with pytest.raises(RangeNotSatisfiable):
+        parse_range("bytes=-0", 1000)
+    with pytest.raises(RangeNotSatisfiable):
+        parse_range("bytes=-10", 0)
+
+
+def test_ranges_outside_the_file_are_not_satisfiable():
+    with pytest.raises(RangeNotSatisfiable):
+        parse_range("bytes=1000-", 1000)
+    with pytest.raises(RangeNotSatisfiable):
+        parse_range("bytes=1000-1100", 1000)
+    with pytest.raises(RangeNotSatisfiable):
+        parse_range("bytes=0-", 0)
+
+
+@pytest.mark.parametrize("header", [
+    None,
+    "",
+    "bytes=-",
+    "bytes=3-2",
+    "bytes=0-1,5-6",
+    "items=0-1",
+    "bytes=a-b",
+])
+def test_headers_served_as_the_whole_file(header):
+    assert parse_range(header, 1000) is None
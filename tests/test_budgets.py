@@ -0,0 +1,93 @@
+from datetime import date, datetime
+
+import pytest
+
+import budgets
+from budgets import contributions, crossed, spending_deltas, total_key
+from codec import encode_fields
+from fx import RateTable
+
+ALICE = "0b6c7f3e-5f0a-4c1e-9d3b-2a1f4e6c8d90"
+BOB = "7d2e9a41-3c5b-4f6e-8a7d-1b2c3d4e5f60"
+WHEN = datetime(2026, 10, 12, 15, 30)
+MONTH = "2026-10"
+
+
+@pytest.fixture(autouse=True)
+def rates(monkeypatch):
+    table = RateTable([(date(2026, 1, 1), "EUR", 7.5)])
+    monkeypatch.setattr(budgets, "get_rates", lambda: table)
+
+
+def stored(**fields):
+    item = {
+        "id": "5e8f1a2b-3c4d-4e5f-8a9b-0c1d2e3f4a5b",
+        "type": "expense",
+        "amount": 100.0,
+        "paidBy": ALICE,
+        "createdAt": WHEN,
+    }
+    item.update(fields)
+    return encode_fields(item)
+
+
+def test_contributions_count_expenses_for_household_and_payer():
+    assert contributions(stored()) == {
+        total_key(MONTH, None): 10000,
+        total_key(MONTH, ALICE): 10000,
+    }
+    assert contributions(stored(paidBy=None)) == {total_key(MONTH, None): 10000}
+    assert contributions(stored(type="cart")) == {}
+    assert contributions(None) == {}
+
+
+def test_cart_item_becoming_an_expense_adds_it():
+    assert spending_deltas([(stored(type="cart"), stored())]) == {
+        total_key(MONTH, None): 10000,
+        total_key(MONTH, ALICE): 10000,
+    }
+    assert spending_deltas([(stored(), stored(type="cart"))]) == {
+        total_key(MONTH, None): -10000,
+        total_key(MONTH, ALICE): -10000,
+    }
+
+
+def test_payer_change_moves_spending_between_payers():
+    # The household total is unchanged, so it gets no delta at all
+    assert spending_deltas([(stored(), stored(paidBy=BOB))]) == {
+        total_key(MONTH, ALICE): -10000,
+        total_key(MONTH, BOB): 10000,
+    }
+
+
+def test_currency_change_converts_both_sides():
+    eur = stored(currency="EUR")
+    assert contributions(eur)[total_key(MONTH, None)] == 75000
+    assert spending_deltas([(stored(), eur)]) == {
+        total_key(MONTH, None): 65000,
+        total_key(MONTH, ALICE): 65000,
+    }
+    assert spending_deltas([(eur, stored(currency="DKK"))]) == {
+        total_key(MONTH, None): -65000,
+        total_key(MONTH, ALICE): -65000,
+    }
+
+
+def test_delete_and_unchanged_items():
+    assert spending_deltas([(stored(amount=12.34), None)]) == {
+        total_key(MONTH, None): -1234,
+        total_key(MONTH, ALICE): -1234,
+    }
+    assert spending_deltas([(stored(), stored(note="renamed"))]) == {}
+    # Several changes in one write are netted per key
+    assert spending_deltas([(None, stored()), (stored(), None)]) == {}
+
+
+def test_crossed_includes_threshold_reached_exactly():
+    assert crossed(1000, [0.8, 1.0], 79999, 80000) == [0.8]
+    assert crossed(1000, [1.0, 0.8], 0, 100000) == [0.8, 1.0]
+    # Already at the threshold: not crossed again
+    assert crossed(1000, [0.8], 80000, 90000) == []
+    assert crossed(1000, [0.8], 79999, 79999) == []
+    # Spending going down never crosses anything
+    assert crossed(1000, [0.8], 90000, 70000) == []
@@ -0,0 +1,86 @@
+import uuid
+from datetime import datetime
+
+from bson.binary import Binary
+from bson.int64 import Int64
+
+from codec import (
+    BASE_CURRENCY, decode_item, encode_fields, encode_id, encode_update, from_minor, id_query,
+    to_minor,
+)
+from migrate_compact import compact_update
+
+ITEM = "0b3e7c1a-5d2f-4c8e-9a61-3f4b2d7e8c90"
+USER = str(uuid.UUID(int=2, version=4))
+
+
+def api_item(**fields):
+    return {
+        "id": ITEM, "name": "Milk", "amount": 12.35, "currency": BASE_CURRENCY,
+        "type": "cart", "createdBy": USER, "paidBy": None,
+        "createdAt": datetime(2026, 1, 1), **fields,
+    }
+
+
+def test_minor_units_round_half_up():
+    assert to_minor(0.1 + 0.2) == 30
+    assert to_minor(12.345) == 1235
+    assert from_minor(1235) == 12.35
+
+
+def test_item_round_trip():
+    doc = encode_fields(api_item())
+    assert isinstance(doc["amount"], Int64) and doc["amount"] == 1235
+    assert isinstance(doc["id"], Binary) and isinstance(doc["createdBy"], Binary)
+    assert "currency" not in doc
+    assert decode_item(doc) == api_item()
+
+
+def test_foreign_currency_is_kept():
+    doc = encode_fields(api_item(currency="EUR"))
+    assert doc["currency"] == "EUR"
+    assert decode_item(doc)["currency"] == "EUR"
+
+
+def test_non_uuid_ids_stay_strings():
+    assert encode_id("user-1") == "user-1"
+    # Uppercase uuids would not decode back to the same string
+    assert encode_id(ITEM.upper()) == ITEM.upper()
+    assert decode_item(encode_fields(api_item(id="legacy-1")))["id"] == "legacy-1"
+
+
+def test_id_query_matches_both_representations():
+    assert id_query(ITEM) == {"$in": [encode_id(ITEM), ITEM]}
+    assert id_query("legacy-1") == "legacy-1"
+
+
+def test_update_to_base_currency_unsets_it():
+    fields, unset = encode_update({"currency": BASE_CURRENCY, "amount": 5})
+    assert fields == {"amount": 500}
+    assert unset == ["currency"]
+    assert encode_update({"currency": "EUR"}) == ({"currency": "EUR"}, [])
+
+
+def test_legacy_document_is_compacted():
+    legacy = {"_id": 1, **api_item(amount=12.35, currency=BASE_CURRENCY)}
+    op = compact_update(legacy)
+    query, update = op._filter, op._doc
+    assert query["amount"] == 12.35 and query["id"] == ITEM
+    assert update["$set"]["amount"] == Int64(1235)
+    assert update["$set"]["id"] == encode_id(ITEM)
+    assert update["$unset"] == {"currency": ""}
+
+    migrated = {**legacy, **update["$set"]}
+    del migrated["currency"]
+    assert compact_update(migrated) is None
+    assert decode_item(migrated) == decode_item(legacy)
+
+
+def test_legacy_recurring_id_is_compacted():
+    rule = str(uuid.UUID(int=3, version=4))
+    compact = {"_id": 2, **encode_fields(api_item(recurringId=rule))}
+    legacy = {**compact, "recurringId": rule}
+    op = compact_update(legacy)
+    assert op._filter["recurringId"] == rule
+    assert op._doc == {"$set": {"recurringId": encode_id(rule)}}
+    assert compact_update(compact) is None
@@ -0,0 +1,101 @@
+from datetime import datetime
+
+from bson import ObjectId
+
+from codec import encode_id
+from events import (
+    apply_event, creation_event, deletion_event, diff_events, replay, update_event,
+)
+
+ITEM = "0b3e7c1a-5d2f-4c8e-9a61-3f4b2d7e8c90"
+OTHER = "7d1f0c2e-9b4a-4e6d-8c3f-5a2b1e0d9c87"
+
+
+def stored(item_id=ITEM, **fields):
+    return {"id": encode_id(item_id), "name": "Milk", "amount": 1200, "type": "cart",
+            "createdAt": datetime(2026, 1, 1), "version": 0, **fields}
+
+
+def logged(*events):
+    """Events as read back from item_events, each with an ObjectId in write order"""
+    return [{**event, "_id": ObjectId()} for event in events]
+
+
+def test_create_update_delete():
+    items = {}
+    applied = replay(items, logged(
+        creation_event(stored()),
+        update_event(stored(name="Oat milk", version=1), ["name"]),
+    ))
+    assert applied == 2
+    assert items[ITEM]["name"] == "Oat milk" and items[ITEM]["version"] == 1
+
+    assert replay(items, logged(deletion_event(stored(version=1)))) == 1
+    assert items == {}
+
+
+def test_events_already_in_the_snapshot_are_skipped():
+    # The snapshot copied the item at version 2; replay starts a little earlier
+    snapshot = {ITEM: stored(name="Skimmed", version=2)}
+    applied = replay(snapshot, logged(
+        creation_event(stored()),
+        update_event(stored(name="Oat milk", version=1), ["name"]),
+        update_event(stored(name="Skimmed", version=2), ["name"]),
+        update_event(stored(name="Skimmed", amount=1500, version=3), ["amount"]),
+    ))
+    assert applied == 1
+    assert snapshot[ITEM]["name"] == "Skimmed"
+    assert snapshot[ITEM]["amount"] == 1500 and snapshot[ITEM]["version"] == 3
+
+
+def test_events_apply_in_version_order_whatever_the_log_order():
+    items = {}
+    events = logged(
+        creation_event(stored()),
+        update_event(stored(name="First", version=1), ["name"]),
+        update_event(stored(name="Second", version=2), ["name"]),
+    )
+    replay(items, [events[0], events[2], events[1]])
+    assert items[ITEM]["name"] == "Second"
+
+
+def test_unset_fields_are_removed():
+    event = update_event(stored(version=1), ["currency"])
+    assert event["data"] == {} and event["unset"] == ["currency"]
+
+    items = {ITEM: stored(currency="EUR")}
+    assert apply_event(items, event)
+    assert "currency" not in items[ITEM]
+
+
+def test_delete_then_recreate():
+    # A re-created item continues from the version its deletion was logged with
+    items = {}
+    replay(items, logged(
+        creation_event(stored()),
+        update_event(stored(name="Oat milk", version=1), ["name"]),
+        deletion_event(stored(version=1)),
+        creation_event(stored(name="Bread", version=3)),
+    ))
+    assert items[ITEM]["name"] == "Bread" and items[ITEM]["version"] == 3
+
+
+def test_create_is_skipped_when_the_item_exists():
+    items = {ITEM: stored(name="Snapshot copy")}
+    assert not apply_event(items, creation_event(stored()))
+    assert items[ITEM]["name"] == "Snapshot copy"
+
+
+def test_diff_events():
+    before = {ITEM: stored(), OTHER: stored(OTHER)}
+    new = stored(OTHER, name="Bread", version=0)
+    after = [stored(name="Oat milk", version=1, fieldTimestamps={"name": datetime(2026, 1, 2)}), new]
+    events = diff_events(before, after, [ITEM])
+    assert events == [update_event(after[0], ["name"])]
+    assert "fieldTimestamps" not in events[0]["data"]
+
+    assert diff_events({}, [new], [OTHER]) == [creation_event(new)]
+    [deletion] = diff_events(before, [], [ITEM])
+    assert deletion == {"item": encode_id(ITEM), "op": "delete", "version": 1}
+    # Nothing changed, nothing logged
+    assert diff_events(before, [stored()], [ITEM]) == []
@@ -0,0 +1,118 @@
+import math
+from datetime import date, datetime
+
+import pytest
+from bson import Int64
+
+from codec import BASE_CURRENCY
+from fx import RateTable, UnknownCurrency
+
+ROWS = [
+    (date(2024, 1, 1), "EUR", 7.0),
+    (date(2024, 1, 10), "EUR", 8.0),
+    (date(2024, 1, 5), "USD", 6.5),
+    (date(2024, 1, 1), BASE_CURRENCY, 1.0),
+]
+
+# Before the first row, on it, between rows, on the last row and after it
+WHEN = [
+    datetime(2023, 12, 1, 9),
+    datetime(2024, 1, 1),
+    datetime(2024, 1, 4, 23, 59),
+    datetime(2024, 1, 7, 12),
+    datetime(2024, 1, 10, 0, 1),
+    datetime(2024, 3, 1, 18),
+]
+
+
+def evaluate(expr, doc):
+    """Evaluate the subset of aggregation expressions amount_expr emits"""
+    if isinstance(expr, str) and expr.startswith("$"):
+        return doc.get(expr[1:])
+    if isinstance(expr, list):
+        return [evaluate(e, doc) for e in expr]
+    if not isinstance(expr, dict):
+        return expr
+    (op, arg), = expr.items()
+    if op == "$switch":
+        for branch in arg["branches"]:
+            if evaluate(branch["case"], doc):
+                return evaluate(branch["then"], doc)
+        return evaluate(arg["default"], doc)
+    if op == "$cond":
+        test, then, otherwise = arg
+        return evaluate(then if evaluate(test, doc) else otherwise, doc)
+    args = evaluate(arg, doc)
+    if op == "$type":
+        return "long" if isinstance(args, Int64) else "double"
+    if op == "$subtract":
+        return (args[0] - args[1]).total_seconds() * 1000
+    if op == "$round":
+        return round(args[0], args[1])
+    return {
+        "$eq": lambda a: a[0] == a[1],
+        "$ifNull": lambda a: a[1] if a[0] is None else a[0],
+        "$arrayElemAt": lambda a: a[0][a[1]],
+        "$min": min,
+        "$max": max,
+        "$floor": math.floor,
+        "$divide": lambda a: a[0] / a[1],
+        "$multiply": lambda a: a[0] * a[1],
+        "$toLong": int,
+    }[op](args)
+
+
+def test_rate_holds_first_and_latest_earlier_row():
+    table = RateTable(ROWS)
+    assert [table.rate("EUR", when) for when in WHEN] == [7.0, 7.0, 7.0, 7.0, 8.0, 8.0]
+    assert [table.rate("USD", when) for when in WHEN] == [6.5, 6.5, 6.5, 6.5, 6.5, 6.5]
+    assert table.rate(BASE_CURRENCY, WHEN[0]) == 1.0
+    assert table.currencies == [BASE_CURRENCY, "EUR", "USD"]
+
+
+def amounts_in(currency, amounts, when):
+    docs = [{"amount": Int64(a), "createdAt": w} for a, w in zip(amounts, when)]
+    if currency:
+        for doc in docs:
+            doc["currency"] = currency
+    return docs
+
+
+def test_conversions_agree_across_the_table():
+    table = RateTable(ROWS)
+    amounts = [1001, 12345, 7, 250, 99999, 1]
+    for currency in ("EUR", "USD", None, BASE_CURRENCY):
+        expected = [table.to_base(a, currency, w) for a, w in zip(amounts, WHEN)]
+        assert table.convert(amounts, [currency] * len(WHEN), WHEN).tolist() == expected
+        expr = table.amount_expr()
+        assert [evaluate(expr, doc) for doc in amounts_in(currency, amounts, WHEN)] == expected
+
+        # A window only has to be right for the items it is matched against,
+        # here the three inside it, across the EUR rate change
+        expr = table.amount_expr(date(2024, 1, 3), date(2024, 1, 11))
+        inside = amounts_in(currency, amounts[2:5], WHEN[2:5])
+        assert [evaluate(expr, doc) for doc in inside] == expected[2:5]
+
+
+def test_convert_mixes_currencies_and_handles_no_rows():
+    table = RateTable(ROWS)
+    converted = table.convert([100, 100, 100], ["EUR", None, "USD"], WHEN[3:])
+    assert converted.tolist() == [700, 100, 650]
+    assert table.convert([], [], []).tolist() == []
+
+
+def test_unknown_currency_is_refused():
+    table = RateTable(ROWS)
+    with pytest.raises(UnknownCurrency):
+        table.rate("SEK", WHEN[0])
+    with pytest.raises(UnknownCurrency):
+        table.to_base(100, "SEK", WHEN[0])
+    with pytest.raises(UnknownCurrency):
+        table.convert([100, 100], ["EUR", "SEK"], WHEN[:2])
+
+
+def test_empty_table_leaves_base_amounts_alone():
+    table = RateTable([])
+    assert table.to_base(123, None, WHEN[0]) == 123
+    assert table.convert([123], [None], WHEN[:1]).tolist() == [123]
+    assert evaluate(table.amount_expr(), {"amount": Int64(123), "createdAt": WHEN[0]}) == 123
@@ -0,0 +1,181 @@
+import asyncio
+import json
+
+from mongomock_motor import AsyncMongoMockClient
+
+from idempotency import IdempotencyMiddleware
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def make_collection():
+    return AsyncMongoMockClient()["test"]["idempotency_keys"]
+
+
+def scope(key="key-1", path="/api/items", headers=()):
+    return {
+        "type": "http",
+        "method": "POST",
+        "path": path,
+        "query_string": b"",
+        "headers": [(b"idempotency-key", key.encode()), *headers],
+    }
+
+
+def receiver(*chunks):
+    messages = [
+        {"type": "http.request", "body": chunk, "more_body": i < len(chunks) - 1}
+        for i, chunk in enumerate(chunks)
+    ]
+
+    async def receive():
+        return messages.pop(0)
+
+    return receive
+
+
+async def call(middleware, body=b"{}", **kwargs):
+    """Run one request through the middleware and return (status, headers, body)"""
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    receive = body if callable(body) else receiver(body)
+    await middleware(scope(**kwargs), receive, send)
+    start = next(m for m in sent if m["type"] == "http.response.start")
+    payload = b"".join(m.get("body", b"") for m in sent if m["type"] == "http.response.body")
+    return start["status"], dict(start["headers"]), payload
+
+
+class App:
+    """Echo endpoint that counts calls; its first call can be held open"""
+
+    def __init__(self, status=201):
+        self.status = status
+        self.calls = 0
+        self.started = asyncio.Event()
+        self.release = None
+
+    async def __call__(self, scope, receive, send):
+        self.calls += 1
+        call = self.calls
+        message = await receive()
+        self.started.set()
+        if call == 1 and self.release is not None:
+            await self.release.wait()
+        body = json.dumps({"call": call, "echo": message["body"].decode()}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": self.status,
+            "headers": [(b"content-type", b"application/json")],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+def test_first_request_claims_key_and_retry_is_replayed():
+    async def scenario():
+        app, collection = App(), make_collection()
+        middleware = IdempotencyMiddleware(app, lambda: collection)
+
+        first = await call(middleware, b'{"amount": 1}')
+        record = await collection.find_one({"_id": "key-1"})
+        assert record["status"] == "complete" and record["responseStatus"] == 201
+
+        status, headers, payload = await call(middleware, b'{"amount": 1}')
+        assert app.calls == 1
+        assert status == 201 and payload == first[2]
+        assert headers[b"idempotent-replayed"] == b"true"
+
+    run(scenario())
+
+
+def test_same_key_with_different_body_is_rejected():
+    async def scenario():
+        app, collection = App(), make_collection()
+        middleware = IdempotencyMiddleware(app, lambda: collection)
+
+        await call(middleware, b'{"amount": 1}')
+        status, _, _ = await call(middleware, b'{"amount": 2}')
+        assert status == 422
+        assert app.calls == 1
+
+    run(scenario())
+
+
+def test_retry_while_first_request_runs_gets_409():
+    async def scenario():
+        app, collection = App(), make_collection()
+        app.release = asyncio.Event()
+        middleware = IdempotencyMiddleware(app, lambda: collection)
+
+        first = asyncio.ensure_future(call(middleware))
+        await app.started.wait()
+        status, headers, _ = await call(middleware)
+        assert status == 409 and headers[b"retry-after"] == b"1"
+
+        app.release.set()
+        assert (await first)[0] == 201
+        assert app.calls == 1
+
+    run(scenario())
+
+
+def test_retry_takes_over_expired_lease_and_only_owner_completes():
+    async def scenario():
+        app, collection = App(), make_collection()
+        app.release = asyncio.Event()
+        # A zero lease has run out by the time the retry arrives
+        middleware = IdempotencyMiddleware(app, lambda: collection, lease_seconds=0)
+
+        stalled = asyncio.ensure_future(call(middleware))
+        await app.started.wait()
+        retry = await call(middleware)
+        assert retry[0] == 201 and json.loads(retry[2])["call"] == 2
+
+        # The stalled first request finishes last; its response must not
+        # replace the one stored by the request that took the lease over
+        app.release.set()
+        await stalled
+        record = await collection.find_one({"_id": "key-1"})
+        assert json.loads(record["responseBody"])["call"] == 2
+
+        lease_held = IdempotencyMiddleware(app, lambda: collection)
+        replayed = await call(lease_held)
+        assert replayed[2] == retry[2]
+        assert app.calls == 2
+
+    run(scenario())
+
+
+def test_server_error_releases_claim_for_retry():
+    async def scenario():
+        app, collection = App(status=503), make_collection()
+        middleware = IdempotencyMiddleware(app, lambda: collection)
+
+        assert (await call(middleware))[0] == 503
+        assert await collection.find_one({"_id": "key-1"}) is None
+
+        app.status = 201
+        assert (await call(middleware))[0] == 201
+        assert app.calls == 2
+
+    run(scenario())
+
+
+def test_body_over_cap_is_refused():
+    async def scenario():
+        app, collection = App(), make_collection()
+        middleware = IdempotencyMiddleware(app, lambda: collection, max_body_bytes=8)
+
+        declared = await call(middleware, b"{}", headers=[(b"content-length", b"9")])
+        streamed = await call(middleware, receiver(b"12345", b"67890"))
+        within = await call(middleware, receiver(b"1234", b"5678"))
+
+        assert declared[0] == 413 and streamed[0] == 413
+        assert within[0] == 201
+        assert app.calls == 1
+
+    run(scenario())
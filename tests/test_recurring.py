@@ -0,0 +1,56 @@
+from datetime import datetime
+
+from recurring import MAX_CATCH_UP, occurrence_id, occurrences
+
+
+def monthly(start, **fields):
+    return {"frequency": "monthly", "startDate": start, **fields}
+
+
+def test_month_end_is_clamped():
+    due = occurrences(monthly(datetime(2024, 1, 31)), None, datetime(2024, 5, 1))
+    assert due == [
+        datetime(2024, 1, 31), datetime(2024, 2, 29), datetime(2024, 3, 31), datetime(2024, 4, 30),
+    ]
+
+
+def test_window_excludes_after_and_includes_until():
+    template = monthly(datetime(2026, 1, 15, 9))
+    due = occurrences(template, datetime(2026, 2, 15, 9), datetime(2026, 4, 15, 9))
+    assert due == [datetime(2026, 3, 15, 9), datetime(2026, 4, 15, 9)]
+
+
+def test_jump_matches_walking_from_the_start():
+    for interval in (1, 2, 3, 5):
+        for frequency in ("monthly", "weekly"):
+            template = {"frequency": frequency, "startDate": datetime(2020, 1, 31), "interval": interval}
+            everything = occurrences(template, None, datetime(2027, 1, 1))
+            after = datetime(2025, 6, 30)
+            assert occurrences(template, after, datetime(2027, 1, 1)) == [
+                when for when in everything if when > after
+            ]
+
+
+def test_interval_and_end_date():
+    template = monthly(datetime(2026, 1, 10), interval=2, endDate=datetime(2026, 7, 1))
+    due = occurrences(template, None, datetime(2027, 1, 1))
+    assert due == [datetime(2026, 1, 10), datetime(2026, 3, 10), datetime(2026, 5, 10)]
+
+
+def test_weekly_on_a_given_weekday():
+    # 2026-01-01 is a Thursday; weekday 0 asks for Mondays
+    template = {"frequency": "weekly", "startDate": datetime(2026, 1, 1), "weekday": 0}
+    due = occurrences(template, None, datetime(2026, 1, 20))
+    assert due == [datetime(2026, 1, 5), datetime(2026, 1, 12), datetime(2026, 1, 19)]
+
+
+def test_catch_up_is_capped():
+    template = {"frequency": "weekly", "startDate": datetime(2000, 1, 1)}
+    due = occurrences(template, None, datetime(2026, 1, 1))
+    assert len(due) == MAX_CATCH_UP
+    assert due[0] == datetime(2000, 1, 1)
+
+
+def test_occurrence_id_is_stable_per_day():
+    assert occurrence_id("t", datetime(2026, 1, 1, 9)) == occurrence_id("t", datetime(2026, 1, 1, 18))
+    assert occurrence_id("t", datetime(2026, 1, 1)) != occurrence_id("t", datetime(2026, 1, 2))
@@ -0,0 +1,84 @@
+import random
+
+import pytest
+
+from codec import encode_id, sum_by_id
+from settlement import (
+    EXACT_MAX_MEMBERS, allocate, compute_balances, settle, settle_exact, settle_greedy,
+)
+
+
+def remaining(balances, transfers):
+    left = dict(balances)
+    for debtor, creditor, amount in transfers:
+        assert amount > 0
+        left[debtor] += amount
+        left[creditor] -= amount
+    return left
+
+
+def random_balances(rng, members):
+    amounts = [rng.randint(-5000, 5000) for _ in range(members - 1)]
+    amounts.append(-sum(amounts))
+    return {f"m{i}": amount for i, amount in enumerate(amounts)}
+
+
+def test_allocate_adds_up_exactly():
+    assert allocate(100, {"a": 1, "b": 1, "c": 1}) == {"a": 34, "b": 33, "c": 33}
+    assert allocate(1001, {"a": 2, "b": 1}) == {"a": 667, "b": 334}
+    assert allocate(100, {"a": 0, "b": 0}) == {}
+    rng = random.Random(1)
+    for _ in range(200):
+        weights = {f"m{i}": rng.choice((0, 0.5, 1, 2, 3)) for i in range(rng.randint(1, 8))}
+        amount = rng.randint(0, 100_000)
+        shares = allocate(amount, weights)
+        if any(weights.values()):
+            assert sum(shares.values()) == amount
+
+
+def test_balances_sum_to_zero():
+    balances = compute_balances(
+        ["a", "b", "c"], {"a": 1000}, [(999, "b", {"a": 1, "c": 2}), (10, "c", {"a": 0})]
+    )
+    assert sum(balances.values()) == 0
+    assert balances == {"a": 1000 - 334 - 333 - 4, "b": 999 - 333 - 3, "c": -333 - 666 + 10 - 3}
+
+
+def test_transfers_settle_every_balance():
+    rng = random.Random(2)
+    for members in range(1, EXACT_MAX_MEMBERS + 1):
+        balances = random_balances(rng, members)
+        for solver in (settle_greedy, settle_exact):
+            assert not any(remaining(balances, solver(balances)).values())
+
+
+def test_exact_never_needs_more_transfers_than_greedy():
+    rng = random.Random(3)
+    for _ in range(50):
+        balances = random_balances(rng, rng.randint(2, 10))
+        assert len(settle_exact(balances)) <= len(settle_greedy(balances))
+
+
+def test_exact_finds_zero_sum_groups():
+    # Greedy pairs the two largest first and needs four transfers
+    balances = {"a": 6, "b": -6, "c": 5, "d": -3, "e": -2}
+    assert len(settle_exact(balances)) == 3
+
+
+def test_settle_mode():
+    small = {"a": 5, "b": -5}
+    assert settle(small) == ("exact", [("b", "a", 5)])
+    assert settle(small, "greedy")[0] == "greedy"
+    large = random_balances(random.Random(4), EXACT_MAX_MEMBERS + 2)
+    assert settle(large)[0] == "greedy"
+    with pytest.raises(ValueError):
+        settle_exact(large)
+
+
+def test_payer_stored_in_both_id_forms_is_summed():
+    payer = "0b3e7c1a-5d2f-4c8e-9a61-3f4b2d7e8c90"
+    # What the per-payer $group returns while the compact migration is running
+    rows = [{"_id": payer, "amount": 600}, {"_id": encode_id(payer), "amount": 400}]
+    paid_by = sum_by_id(rows, "amount")
+    assert paid_by == {payer: 1000}
+    assert compute_balances([payer, "other"], paid_by) == {payer: 500, "other": -500}
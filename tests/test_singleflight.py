@@ -0,0 +1,32 @@
+import asyncio
+
+from singleflight import SingleFlight
+
+
+def test_concurrent_calls_share_one_load():
+    async def scenario():
+        flights = SingleFlight()
+        gate = asyncio.Event()
+        loads = []
+
+        async def load():
+            number = len(loads) + 1
+            loads.append(number)
+            await gate.wait()
+            return number
+
+        first = asyncio.ensure_future(flights.do("items", load))
+        await asyncio.sleep(0)
+        joined = asyncio.ensure_future(flights.do("items", load))
+        await asyncio.sleep(0)
+        flights.invalidate()
+        after_write = asyncio.ensure_future(flights.do("items", load))
+        await asyncio.sleep(0)
+        gate.set()
+        assert await first == await joined == 1
+        # The read issued after the write started its own load
+        assert await after_write == 2
+        assert loads == [1, 2]
+        assert len(flights) == 0
+
+    asyncio.run(scenario())
@@ -0,0 +1,114 @@
+from datetime import datetime, timedelta, timezone
+
+from codec import encode_id, id_query
+from sync import merge_mutations
+
+ITEM = "0b3e7c1a-5d2f-4c8e-9a61-3f4b2d7e8c90"
+T0 = datetime(2026, 1, 1, 12, 0)
+
+
+def stored(**fields):
+    stamps = {f: T0 for f in ("name", "amount", "type")}
+    return {"id": encode_id(ITEM), "name": "Milk", "amount": 1200, "type": "cart",
+            "version": 3, "fieldTimestamps": stamps, **fields}
+
+
+def mutation(client_id, minutes, op="update", data=None, **extra):
+    return {"clientId": client_id, "clientTimestamp": T0 + timedelta(minutes=minutes),
+            "op": op, "itemId": ITEM, "data": data, **extra}
+
+
+def statuses(results):
+    return {r["clientId"]: r["status"] for r in results}
+
+
+def test_last_writer_wins_per_field():
+    results, writes = merge_mutations(
+        [
+            mutation("b", 20, data={"name": "Oat milk"}),
+            mutation("a", 10, data={"name": "Whole milk", "amount": 1500}),
+        ],
+        {ITEM: stored()},
+    )
+    assert statuses(results) == {"a": "applied", "b": "applied"}
+    [write] = writes
+    assert write["op"] == "update" and write["itemId"] == ITEM
+    # Only matches while nobody else has written the item since it was read
+    assert write["filter"] == {"id": id_query(ITEM), "version": 3}
+    update = write["update"]
+    assert update["$set"]["name"] == "Oat milk"
+    assert update["$set"]["amount"] == 1500
+    assert update["$set"]["fieldTimestamps.name"] == T0 + timedelta(minutes=20)
+    assert update["$inc"] == {"version": 1}
+
+
+def test_older_write_is_stale():
+    current = stored(fieldTimestamps={"name": T0 + timedelta(hours=1)})
+    results, writes = merge_mutations(
+        [mutation("a", 10, data={"name": "Old name"})], {ITEM: current}
+    )
+    assert statuses(results) == {"a": "stale"}
+    assert writes == []
+
+
+def test_mixed_timezone_awareness_sorts():
+    aware = mutation("a", 0, data={"name": "Later"})
+    aware["clientTimestamp"] = (T0 + timedelta(minutes=30)).replace(tzinfo=timezone.utc)
+    results, writes = merge_mutations(
+        [aware, mutation("b", 10, data={"name": "Earlier"})], {ITEM: stored()}
+    )
+    assert statuses(results) == {"a": "applied", "b": "applied"}
+    assert writes[0]["update"]["$set"]["name"] == "Later"
+
+
+def test_create_twice_is_duplicate():
+    data = {"name": "Bread", "amount": 3000, "type": "cart"}
+    results, writes = merge_mutations(
+        [mutation("a", 0, "create", data), mutation("b", 1, "create", data)], {}
+    )
+    assert statuses(results) == {"a": "applied", "b": "duplicate"}
+    [write] = writes
+    assert write["op"] == "insert"
+    assert write["doc"]["fieldTimestamps"]["name"] == T0
+
+
+def test_missing_item_is_not_found():
+    results, writes = merge_mutations(
+        [mutation("a", 0, data={"name": "X"}), mutation("b", 1, "delete")], {}
+    )
+    assert statuses(results) == {"a": "not_found", "b": "not_found"}
+    assert writes == []
+
+
+def test_delete_then_update_is_not_found():
+    results, writes = merge_mutations(
+        [mutation("a", 0, "delete"), mutation("b", 1, data={"name": "X"})], {ITEM: stored()}
+    )
+    assert statuses(results) == {"a": "applied", "b": "not_found"}
+    assert writes == [
+        {"itemId": ITEM, "op": "delete", "filter": {"id": id_query(ITEM), "version": 3}}
+    ]
+
+
+def test_unset_removes_the_stored_field():
+    results, writes = merge_mutations(
+        [mutation("a", 10, data={}, unset=["currency"])], {ITEM: stored(currency="EUR")}
+    )
+    assert statuses(results) == {"a": "applied"}
+    update = writes[0]["update"]
+    assert update["$unset"] == {"currency": ""}
+    assert "currency" not in update["$set"]
+    assert update["$set"]["fieldTimestamps.currency"] == T0 + timedelta(minutes=10)
+
+
+def test_unversioned_item_matches_version_zero():
+    current = stored()
+    del current["version"]
+    _, writes = merge_mutations([mutation("a", 10, data={"name": "X"})], {ITEM: current})
+    assert writes[0]["filter"]["version"] == {"$in": [0, None]}
+
+
+def test_recreate_continues_after_the_deletion():
+    data = {"name": "Bread", "amount": 3000, "type": "cart", "version": 0}
+    _, writes = merge_mutations([mutation("a", 0, "create", data)], {}, {ITEM: 4})
+    assert writes[0]["doc"]["version"] == 5
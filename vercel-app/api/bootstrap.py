@@ -0,0 +1,163 @@
+from http.server import BaseHTTPRequestHandler
+import json
+import os
+from urllib.parse import urlparse, parse_qs
+import csv
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, time, timedelta
+
+# Reused across warm invocations; pymongo is imported on first use
+_db = None
+
+def get_db():
+    global _db
+    if _db is None:
+        from pymongo import MongoClient
+        _db = MongoClient(os.environ.get('MONGO_URL', ''))['shared_expenses']
+    return _db
+
+VIEW_TYPES = {'cart': 'cart', 'expenses': 'expense', 'history': None}
+
+# Totals are in the base currency and summed by the database. fx_rates.csv
+# (same file as the backend's) holds DKK per unit of each currency by date;
+# a date without a row uses the latest earlier rate. Loaded once per warm
+# instance.
+BASE_CURRENCY = 'DKK'
+RATES_FILE = os.path.join(os.path.dirname(__file__), 'fx_rates.csv')
+MS_PER_DAY = 24 * 60 * 60 * 1000
+_amount_expr = None
+
+def load_rates():
+    series = {}
+    with open(RATES_FILE, newline='') as f:
+        for row in csv.DictReader(line for line in f if not line.startswith('#')):
+            currency = row['currency'].strip().upper()
+            if currency != BASE_CURRENCY:
+                series.setdefault(currency, []).append(
+                    (date.fromisoformat(row['date']), float(row['rate']))
+                )
+    return {currency: sorted(points) for currency, points in series.items()}
+
+def get_amount_expr():
+    """Aggregation expression for an item's amount in the base currency.
+
+    Each currency's rates are inlined as a per-day array over the span of
+    the rates file, indexed by the item's day (clamped to the span). Items
+    in a currency without rates come out as null, which $sum skips.
+    """
+    global _amount_expr
+    if _amount_expr is None:
+        rates = load_rates()
+        # Items written before currencies existed are in the base currency
+        currency = {'$ifNull': ['$currency', BASE_CURRENCY]}
+        branches = [{'case': {'$eq': [currency, BASE_CURRENCY]}, 'then': 1}]
+        if rates:
+            start = min(points[0][0] for points in rates.values())
+            end = max(points[-1][0] for points in rates.values())
+            days = (end - start).days + 1
+            index = {'$min': [days - 1, {'$max': [0, {'$floor': {'$divide': [
+                {'$subtract': [{'$ifNull': ['$createdAt', '$$NOW']}, datetime.combine(start, time())]},
+                MS_PER_DAY,
+            ]}}]}]}
+            for code, points in sorted(rates.items()):
+                daily, i = [], 0
+                for n in range(days):
+                    day = start + timedelta(days=n)
+                    while i + 1 < len(points) and points[i + 1][0] <= day:
+                        i += 1
+                    daily.append(points[i][1])
+                branches.append({
+                    'case': {'$eq': [currency, code]},
+                    'then': {'$arrayElemAt': [daily, index]},
+                })
+        rate = {'$switch': {'branches': branches, 'default': None}}
+        _amount_expr = {'$multiply': [{'$ifNull': ['$amount', 0]}, rate]}
+    return _amount_expr
+
+def load_users(db):
+    return list(db.users.find({}, {'_id': 0}))
+
+def load_items(db, item_type):
+    query = {'type': item_type} if item_type else {}
+    return list(db.items.find(query, {'_id': 0}).sort('createdAt', -1))
+
+def load_totals(db, item_type):
+    is_expense = {'$eq': ['$type', 'expense']}
+    pipeline = [
+        {'$match': {'type': item_type} if item_type else {}},
+        {'$project': {
+            'type': 1, 'isDivided': 1, 'paidBy': 1, 'base': get_amount_expr(),
+        }},
+        {'$facet': {
+            'sums': [{'$group': {
+                '_id': None,
+                'total': {'$sum': '$base'},
+                'count': {'$sum': 1},
+                'expenseTotal': {'$sum': {'$cond': [is_expense, '$base', 0]}},
+                'dividedTotal': {'$sum': {'$cond': [
+                    {'$and': [is_expense, {'$eq': ['$isDivided', True]}]}, '$base', 0,
+                ]}},
+                'unconverted': {'$sum': {'$cond': [{'$eq': ['$base', None]}, 1, 0]}},
+            }}],
+            'paidBy': [
+                {'$match': {'type': 'expense', 'paidBy': {'$nin': [None, '']}}},
+                {'$group': {'_id': '$paidBy', 'amount': {'$sum': '$base'}}},
+            ],
+        }},
+    ]
+    result = next(db.items.aggregate(pipeline))
+    sums = result['sums'][0] if result['sums'] else {}
+    return {
+        'currency': BASE_CURRENCY,
+        'total': sums.get('total', 0),
+        'count': sums.get('count', 0),
+        'expenseTotal': sums.get('expenseTotal', 0),
+        'dividedTotal': sums.get('dividedTotal', 0),
+        'paidBy': {row['_id']: row['amount'] for row in result['paidBy']},
+        # Items in a currency the rates file has no rates for are left out
+        'unconverted': sums.get('unconverted', 0),
+    }
+
+class handler(BaseHTTPRequestHandler):
+    def do_OPTIONS(self):
+        self.send_response(200)
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Access-Control-Allow-Methods', 'GET, OPTIONS')
+        self.send_header('Access-Control-Allow-Headers', 'Content-Type')
+        self.end_headers()
+        return
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header('Content-type', 'application/json')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.end_headers()
+
+        try:
+            parsed = urlparse(self.path)
+            params = parse_qs(parsed.query)
+            view = params.get('view', ['history'])[0]
+            if view not in VIEW_TYPES:
+                raise ValueError(f"Unknown view: {view}")
+
+            db = get_db()
+            # pymongo is blocking, so run the queries side by side on threads
+            with ThreadPoolExecutor(max_workers=3) as pool:
+                users = pool.submit(load_users, db)
+                items = pool.submit(load_items, db, VIEW_TYPES[view])
+                totals = pool.submit(load_totals, db, VIEW_TYPES[view])
+                users, items, totals = users.result(), items.result(), totals.result()
+
+            for item in items:
+                if 'createdAt' in item and isinstance(item['createdAt'], datetime):
+                    item['createdAt'] = item['createdAt'].isoformat()
+            response = {
+                "users": users,
+                "items": items,
+                "totals": totals,
+            }
+        except Exception as e:
+            response = {"error": str(e)}
+
+        self.wfile.write(json.dumps(response).encode())
+        return
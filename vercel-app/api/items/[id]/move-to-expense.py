@@ -1,14 +1,18 @@
 from http.server import BaseHTTPRequestHandler
 import json
 import os
-from pymongo import MongoClient
 from urllib.parse import urlparse, parse_qs
 from datetime import datetime
 
+# Reused across warm invocations; pymongo is imported on first use
+_db = None
+
 def get_db():
-    mongo_url = os.environ.get('MONGO_URL', '')
-    client = MongoClient(mongo_url)
-    return client['shared_expenses']
+    global _db
+    if _db is None:
+        from pymongo import MongoClient
+        _db = MongoClient(os.environ.get('MONGO_URL', ''))['shared_expenses']
+    return _db
 
 def get_item_id(path):
     # Path: /api/items/abc123/move-to-expense?paid_by=xyz
@@ -1,15 +1,35 @@
 from http.server import BaseHTTPRequestHandler
 import json
 import os
-from pymongo import MongoClient
 from urllib.parse import urlparse, parse_qs
+import csv
 import uuid
 from datetime import datetime
 
+# Amounts are stored in the currency they were paid in; bootstrap.py converts
+# totals into the base currency with the rates in fx_rates.csv, so a currency
+# is accepted only if that file has rates for it. Read once per warm instance.
+BASE_CURRENCY = 'DKK'
+RATES_FILE = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'fx_rates.csv')
+_currencies = None
+
+def get_currencies():
+    global _currencies
+    if _currencies is None:
+        with open(RATES_FILE, newline='') as f:
+            rows = csv.DictReader(line for line in f if not line.startswith('#'))
+            _currencies = {BASE_CURRENCY} | {row['currency'].strip().upper() for row in rows}
+    return _currencies
+
+# Reused across warm invocations; pymongo is imported on first use
+_db = None
+
 def get_db():
-    mongo_url = os.environ.get('MONGO_URL', '')
-    client = MongoClient(mongo_url)
-    return client['shared_expenses']
+    global _db
+    if _db is None:
+        from pymongo import MongoClient
+        _db = MongoClient(os.environ.get('MONGO_URL', ''))['shared_expenses']
+    return _db
 
 class handler(BaseHTTPRequestHandler):
     def do_OPTIONS(self):
@@ -57,13 +77,16 @@ class handler(BaseHTTPRequestHandler):
             content_length = int(self.headers.get('Content-Length', 0))
             body = self.rfile.read(content_length)
             data = json.loads(body)
+            currency = data.get('currency', BASE_CURRENCY).upper()
+            if currency not in get_currencies():
+                raise ValueError(f"Unsupported currency: {currency}")
             
             db = get_db()
             item = {
                 "id": str(uuid.uuid4()),
                 "name": data.get('name', ''),
                 "amount": float(data.get('amount', 0)),
-                "currency": "DKK",
+                "currency": currency,
                 "type": data.get('type', 'cart'),
                 "paidBy": data.get('paidBy'),
                 "isDivided": data.get('isDivided', False),
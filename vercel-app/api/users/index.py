@@ -1,12 +1,16 @@
 from http.server import BaseHTTPRequestHandler
 import json
 import os
-from pymongo import MongoClient
+
+# Reused across warm invocations; pymongo is imported on first use
+_db = None
 
 def get_db():
-    mongo_url = os.environ.get('MONGO_URL', '')
-    client = MongoClient(mongo_url)
-    return client['shared_expenses']
+    global _db
+    if _db is None:
+        from pymongo import MongoClient
+        _db = MongoClient(os.environ.get('MONGO_URL', ''))['shared_expenses']
+    return _db
 
 class handler(BaseHTTPRequestHandler):
     def do_OPTIONS(self):
@@ -36,8 +36,16 @@ interface User {
   name: string;
 }
 
+interface Totals {
+  currency: string;
+  total: number;
+  expenseTotal: number;
+}
+
 export default function CartScreen() {
   const [items, setItems] = useState<Item[]>([]);
+  // Computed by the server, converted into the base currency
+  const [totals, setTotals] = useState<Totals | null>(null);
   const [users, setUsers] = useState<User[]>([]);
   const [currentUser, setCurrentUser] = useState<User | null>(null);
   const [loading, setLoading] = useState(true);
@@ -63,13 +71,11 @@ export default function CartScreen() {
         setCurrentUser({ id: userId, name: userName });
       }
 
-      const usersRes = await fetch(`${API_URL}/api/users`);
-      const usersData = await usersRes.json();
-      setUsers(usersData);
-
-      const itemsRes = await fetch(`${API_URL}/api/items?type=cart`);
-      const itemsData = await itemsRes.json();
-      setItems(itemsData);
+      const res = await fetch(`${API_URL}/api/bootstrap?view=cart`);
+      const data = await res.json();
+      setUsers(data.users);
+      setItems(data.items);
+      setTotals(data.totals);
     } catch (error) {
       console.error('Error loading data:', error);
     } finally {
@@ -202,7 +208,7 @@ export default function CartScreen() {
     );
   }
 
-  const totalAmount = items.reduce((sum, item) => sum + item.amount, 0);
+  const totalAmount = totals?.total ?? 0;
 
   return (
     <SafeAreaView style={styles.container} edges={['top']}>
@@ -215,7 +221,7 @@ export default function CartScreen() {
 
       <View style={styles.summaryCard}>
         <Text style={styles.summaryLabel}>Total to Buy</Text>
-        <Text style={styles.summaryAmount}>{totalAmount.toFixed(2)} DKK</Text>
+        <Text style={styles.summaryAmount}>{totalAmount.toFixed(2)} {totals?.currency ?? 'DKK'}</Text>
         <Text style={styles.summaryCount}>{items.length} items</Text>
       </View>
 
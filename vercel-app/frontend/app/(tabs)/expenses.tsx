@@ -36,8 +36,16 @@ interface User {
   name: string;
 }
 
+interface Totals {
+  currency: string;
+  total: number;
+  expenseTotal: number;
+}
+
 export default function ExpensesScreen() {
   const [items, setItems] = useState<Item[]>([]);
+  // Computed by the server, converted into the base currency
+  const [totals, setTotals] = useState<Totals | null>(null);
   const [users, setUsers] = useState<User[]>([]);
   const [currentUser, setCurrentUser] = useState<User | null>(null);
   const [loading, setLoading] = useState(true);
@@ -63,13 +71,11 @@ export default function ExpensesScreen() {
         setSelectedPayer(userId);
       }
 
-      const usersRes = await fetch(`${API_URL}/api/users`);
-      const usersData = await usersRes.json();
-      setUsers(usersData);
-
-      const itemsRes = await fetch(`${API_URL}/api/items?type=expense`);
-      const itemsData = await itemsRes.json();
-      setItems(itemsData);
+      const res = await fetch(`${API_URL}/api/bootstrap?view=expenses`);
+      const data = await res.json();
+      setUsers(data.users);
+      setItems(data.items);
+      setTotals(data.totals);
     } catch (error) {
       console.error('Error loading data:', error);
     } finally {
@@ -207,7 +213,7 @@ export default function ExpensesScreen() {
     );
   }
 
-  const totalAmount = items.reduce((sum, item) => sum + item.amount, 0);
+  const totalAmount = totals?.total ?? 0;
   const dividedItems = items.filter((item) => item.isDivided);
   const pendingItems = items.filter((item) => !item.isDivided);
 
@@ -221,7 +227,7 @@ export default function ExpensesScreen() {
       <View style={styles.summaryRow}>
         <View style={[styles.summaryCard, { flex: 1 }]}>
           <Text style={styles.summaryLabel}>Total</Text>
-          <Text style={styles.summaryAmount}>{totalAmount.toFixed(2)} DKK</Text>
+          <Text style={styles.summaryAmount}>{totalAmount.toFixed(2)} {totals?.currency ?? 'DKK'}</Text>
         </View>
         <View style={[styles.summaryCard, { flex: 1 }]}>
           <Text style={styles.summaryLabel}>Divided</Text>
@@ -29,8 +29,16 @@ interface User {
   name: string;
 }
 
+interface Totals {
+  currency: string;
+  total: number;
+  expenseTotal: number;
+}
+
 export default function HistoryScreen() {
   const [items, setItems] = useState<Item[]>([]);
+  // Computed by the server, converted into the base currency
+  const [totals, setTotals] = useState<Totals | null>(null);
   const [users, setUsers] = useState<User[]>([]);
   const [loading, setLoading] = useState(true);
   const [refreshing, setRefreshing] = useState(false);
@@ -43,13 +51,11 @@ export default function HistoryScreen() {
 
   const loadData = async () => {
     try {
-      const usersRes = await fetch(`${API_URL}/api/users`);
-      const usersData = await usersRes.json();
-      setUsers(usersData);
-
-      const itemsRes = await fetch(`${API_URL}/api/items`);
-      const itemsData = await itemsRes.json();
-      setItems(itemsData);
+      const res = await fetch(`${API_URL}/api/bootstrap?view=history`);
+      const data = await res.json();
+      setUsers(data.users);
+      setItems(data.items);
+      setTotals(data.totals);
     } catch (error) {
       console.error('Error loading data:', error);
     } finally {
@@ -142,7 +148,7 @@ export default function HistoryScreen() {
   const cartItems = items.filter((i) => i.type === 'cart');
   const expenseItems = items.filter((i) => i.type === 'expense');
   const dividedExpenses = expenseItems.filter((i) => i.isDivided);
-  const totalExpenses = expenseItems.reduce((sum, i) => sum + i.amount, 0);
+  const totalExpenses = totals?.expenseTotal ?? 0;
 
   return (
     <SafeAreaView style={styles.container} edges={['top']}>
@@ -171,7 +177,7 @@ export default function HistoryScreen() {
 
       <View style={styles.totalCard}>
         <Text style={styles.totalLabel}>Total Expenses</Text>
-        <Text style={styles.totalAmount}>{totalExpenses.toFixed(2)} DKK</Text>
+        <Text style={styles.totalAmount}>{totalExpenses.toFixed(2)} {totals?.currency ?? 'DKK'}</Text>
       </View>
 
       <FlatList